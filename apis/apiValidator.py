@@ -1,25 +1,78 @@
 from namespaces import get_namespace, NamespaceEnum
 from flask_restx import Resource
-from validator import  create, has_required_metadata_files, createGuidedMode, delete_validation_directory
-from flask import request
-import subprocess
+from validator import has_required_metadata_files
+from validator import ingest_validation_request, is_streaming_available, StreamedPayloadError
+from validator import spool_request, discard_spooled_request
+from workerPool import get_worker_pool, add_completion_listener, QueueFullError, JobAlreadyQueuedError, JobNotCancellableError
+from resultCache import get_result_cache, compute_cache_key, compute_stream_cache_key, cache_finished_result
+from serverConfig import settings
+from jobProgress import JobRecord, delete_job_record, add_progress_listener
+from resultStore import load_results, save_results, discard_previous_results, filter_parsed_report, encode_cursor, decode_cursor, InvalidCursorError
+from errorReport import write_compressed_full_report, read_compressed_full_report, delete_full_report, decode_report, decompress_report, resolve_json_pointer, JSONPointerError
+from jobStore import get_job_store
+from jobEvents import get_job_notifier, WaiterLimitError
+from serverMetrics import observe_finished_job
+from flask import request, Response
 import os.path
-from os.path import expanduser
 import json 
+import time
 
 api = get_namespace(NamespaceEnum.VALIDATE_DATASET)
 
+# store every finished validation in the result cache so unchanged datasets are not validated twice
+add_completion_listener(cache_finished_result)
+
+# wake the long-poll and event stream requests of a client whenever its job makes progress or finishes
+add_progress_listener(lambda clientUUID: get_job_notifier().publish(clientUUID))
+add_completion_listener(lambda job: get_job_notifier().publish(job["clientUUID"]))
+
+# the workers run in their own processes, the outcome of their jobs is recorded in the server's metrics once they finish
+add_completion_listener(lambda job: observe_finished_job(job["clientUUID"]))
+
 @api.route('/validate')
 class ValidateDatasetLocal(Resource):
-    @api.doc(responses={201: "Success", 400: "Bad Request", 500: "Internal Server Error"}, 
+    @api.doc(responses={202: "Accepted, poll the results URL for the outcome", 400: "Bad Request", 409: "Conflict", 500: "Internal Server Error", 503: "Validation queue is full"}, 
              description="Create a validation report for a dataset given the constituent pieces of the dataset",
              params={"dataset_structure": "SODA JSON Structure", "manifests": "JSON of a pandas dataframe", "metadata_files": "JSON of a pandas dataframe", "clientUUID": "A unique identifier for creating the folder structure"}
             )
     def post(self):
         """
-        Validate a dataset given the constituent pieces by making a skeleton then validating it
+        Validate a dataset given the constituent pieces. The request is answered once it is queued, a worker then makes a
+        skeleton and validates it
         """
-        data = request.get_json()
+        # reject before reading a potentially huge request body when there is no room in the job queue
+        pool = get_worker_pool()
+        if pool.is_full():
+            return self.queue_full_response("The validation queue is full")
+
+        # large bodies are streamed: the skeleton is built while the body is read instead of after it is fully in memory
+        streamed_payload = None
+        if is_streaming_available() and self.estimated_body_size() > settings.STREAMING_THRESHOLD_BYTES:
+            streamed_payload = self.read_streamed_payload()
+
+        try:
+            return self.validate(pool, streamed_payload)
+        finally:
+            if streamed_payload is not None:
+                streamed_payload.cleanup()
+
+    def estimated_body_size(self):
+        if request.content_length:
+            return request.content_length
+        # compressed bodies are inflated on the fly ( see configureCompression ) so only their compressed size is known
+        return request.environ.get("validator.compressed_content_length", 0) * settings.ESTIMATED_COMPRESSION_RATIO
+
+    def read_streamed_payload(self):
+        skeleton_started_at = time.time()
+        try:
+            streamed_payload = ingest_validation_request(request.stream)
+        except StreamedPayloadError as e:
+            api.abort(400, str(e))
+        streamed_payload.skeleton_timing = (skeleton_started_at, time.time())
+        return streamed_payload
+
+    def validate(self, pool, streamed_payload):
+        data = streamed_payload.data if streamed_payload is not None else request.get_json()
 
         guided_mode = False
 
@@ -42,7 +95,6 @@ class ValidateDatasetLocal(Resource):
             guided_mode = True
 
 
-        dataset_structure = data["dataset_structure"]["dataset-structure"]
         manifests = data["manifests"]
         metadata_files = data["metadata_files"]
         clientUUID = data["clientUUID"]
@@ -55,49 +107,397 @@ class ValidateDatasetLocal(Resource):
             if not has_required_metadata_files(metadata_files):
                 api.abort(400, f"{clientUUID}: Missing required metadata files")
 
+        if pool.has_job(clientUUID):
+            api.abort(409, f"{clientUUID}: A validation job is already queued or running for this client")
 
-        try:
-            api.logger.info(f"{clientUUID}: 1. Creating skeleton dataset ( Guided: {guided_mode} ) ")
-            if "guided-options" in data["dataset_structure"]:
-                generation_location = createGuidedMode(data["dataset_structure"], clientUUID, manifests)
+        # an unchanged dataset gets its previous result back without building a skeleton or running the validator
+        cache = get_result_cache()
+        cache_key = None
+        if cache is not None:
+            if streamed_payload is not None:
+                cache_key = compute_stream_cache_key(streamed_payload.member_digests)
             else:
-                generation_location = create(dataset_structure, manifests, metadata_files, clientUUID)
-        except Exception as e:
-            # remove any directory that was created, if created
-            delete_validation_directory(clientUUID)
-            api.abort(500, f"{clientUUID}: {e}")
+                cache_key = compute_cache_key(data["dataset_structure"], manifests, metadata_files)
+            cached_results = cache.get(cache_key)
+            if cached_results is not None:
+                # hold the clientUUID while the result is written so a concurrent submission can not queue a job that discards it
+                try:
+                    pool.reserve(clientUUID, check_capacity=False)
+                except JobAlreadyQueuedError as e:
+                    api.abort(409, str(e))
+                try:
+                    api.logger.info(f"{clientUUID}: Serving cached validation result {cache_key} ( Guided: {guided_mode} ) ")
+                    self.write_cached_result(clientUUID, cached_results, cache.get_full_report(cache_key))
+                finally:
+                    pool.release(clientUUID)
+                return self.accepted_response(clientUUID)
+            api.logger.info(f"{clientUUID}: No cached validation result for {cache_key} ( Guided: {guided_mode} ) ")
+
+        # reserve a place in the job queue before doing any work so an overloaded server rejects the request quickly
+        try:
+            pool.reserve(clientUUID)
+        except QueueFullError as e:
+            api.logger.info(f"{clientUUID}: Rejected, validation queue is full ( Guided: {guided_mode} ) ")
+            return self.queue_full_response(str(e))
+        except JobAlreadyQueuedError as e:
+            api.abort(409, str(e))
 
 
+        # start a fresh progress record for this job; it is carried through to the final result
+        job_record = JobRecord(clientUUID)
+        job_record.register()
+        # remove a stale result from a previous run so the client does not pick it up while this job runs
+        discard_previous_results(clientUUID)
+
+        if streamed_payload is not None:
+            # the placeholder tree was built while the body was read
+            job_record.record_stage("skeleton", *streamed_payload.skeleton_timing)
+
         try:
-            api.logger.info(f"{clientUUID}: 4. Validating the dataset ( Guided: {guided_mode} ) ")
-            # return val_dataset_local_pipeline(generation_location, clientUUID)
-            subprocess.Popen(["python3", "validate.py", generation_location, clientUUID])
-            print("We are done early")
+            # the skeleton, metadata files and manifests are built by the worker, the request only spools the payload
+            spool_request(clientUUID, data, guided_mode, streamed_payload)
+
+            api.logger.info(f"{clientUUID}: Queued for validation ( Guided: {guided_mode} ) ")
+            # hand the job to a pre-warmed worker process; the client polls /results/<clientUUID> for the outcome
+            job_record.mark_queued()
+            pool.submit(clientUUID, spooled=True, cache_key=cache_key)
         except Exception as e:
-            # remove the directory that was created, if created
-            delete_validation_directory(clientUUID)
+            discard_spooled_request(clientUUID)
+            delete_job_record(clientUUID)
+            pool.release(clientUUID)
             api.abort(500, f"{clientUUID}: {e}")
+
+        return self.accepted_response(clientUUID)
+
+    def accepted_response(self, clientUUID):
+        results_url = f"{request.script_root}{api.path}/results/{clientUUID}"
+        return {"clientUUID": clientUUID, "status": "WIP", "results": results_url}, 202, {"Location": results_url}
+
+    def write_cached_result(self, clientUUID, cached_results, full_report):
+        job_record = JobRecord(clientUUID)
+        job_record.data["cache_hit"] = True
+        job_record.register()
+        job_record.finish(cached_results["status"])
+
+        if full_report is not None:
+            write_compressed_full_report(clientUUID, *full_report)
+        else:
+            delete_full_report(clientUUID)
+        cached_results = {**cached_results, "full_report_available": full_report is not None}
+
+        save_results(clientUUID, {**cached_results, "progress": job_record.to_dict()})
+        observe_finished_job(clientUUID)
+
+    def queue_full_response(self, message):
+        return {"message": message}, 503, {"Retry-After": str(settings.QUEUE_FULL_RETRY_AFTER_SECONDS)}
         
 
+@api.route('/validate/<string:clientUUID>')
+class ValidateDatasetLocalJob(Resource):
+    @api.doc(responses={200: "Cancelled", 404: "Unknown clientUUID", 409: "The job already finished or is still being submitted"})
+    def delete(self, clientUUID):
+        """
+        Cancel the validation job of the client, stopping it if it is running and removing its skeleton
+        """
+        try:
+            stage = get_worker_pool().cancel(clientUUID)
+        except JobNotCancellableError as e:
+            api.abort(409, str(e))
+
+        if stage is None:
+            job = get_job_store().get_job(clientUUID)
+            if job is None:
+                api.abort(404, f"{clientUUID}: No validation job is known for this client")
+            api.abort(409, f"{clientUUID}: The validation job already finished with status {job['status']}")
+
+        api.logger.info(f"{clientUUID}: Validation cancelled by the client in stage {stage}")
+        return {"clientUUID": clientUUID, "status": "Cancelled", "stage": stage}
+
+
+RESULT_VIEWS = ["full", "summary"]
+
 @api.route('/results/<string:clientUUID>')
 class ValidateDatasetLocalResult(Resource):
+    @api.doc(responses={200: "Success", 304: "Not Modified", 400: "Bad Request", 404: "Unknown or expired clientUUID"},
+             params={
+                 "view": "full ( every parsed error ) or summary ( errors grouped by path template and message )",
+                 "wait": "Seconds to wait for the job to finish before answering with its progress ( long polling )",
+             })
     def get(self, clientUUID):
         """
         Get the result of a validation report
         """
-        results_path = os.path.join(expanduser("~"), "SODA", "results")
-        user_file_path = os.path.join(results_path, f"{clientUUID}.json")
+        view = self.requested_view()
+        try:
+            wait = min(float(request.args.get("wait", 0)), settings.LONG_POLL_MAX_SECONDS)
+        except ValueError:
+            api.abort(400, "wait must be a number of seconds")
 
-        # check if a file exists in the results directory with the given clientUUID
-        if not os.path.exists(user_file_path):
-            return {"status": "WIP", "parsed_report": {}, "full_report": {}}
-        
-        # read the file and return the contents
-        results = {}
-        with open(user_file_path, "r") as f:
-            results = json.load(f)
+        # WIP responses carry the job's revision as their ETag, a client whose job did not change since gets a 304 without
+        # the job store being read. The revision is read before the job store so a change made meanwhile is never hidden.
+        notifier = get_job_notifier()
+        version = notifier.version(clientUUID)
+        if self.wip_etag(clientUUID, version) in request.if_none_match:
+            if wait > 0:
+                version = self.wait_for_change(clientUUID, version, wait)
+            if self.wip_etag(clientUUID, version) in request.if_none_match:
+                return self.not_modified_response(clientUUID, version)
+
+        results = self.finished_results(clientUUID)
+        if results is None and wait > 0:
+            results, version = self.wait_for_results(clientUUID, wait, version)
+
+        # no results yet
+        if results is None:
+            return self.wip_response(clientUUID), 200, self.wip_headers(clientUUID, version)
 
-        # remove the results file 
-        os.remove(user_file_path)
+        # the results stay readable until they expire ( see VALIDATOR_RESULTS_TTL_SECONDS )
+        return self.results_view(results, view)
 
+    @staticmethod
+    def wip_etag(clientUUID, version):
+        # the queue position is part of the response but changes without the job itself changing
+        return f"{get_job_notifier().run_id}-{version}-{get_worker_pool().queue_position(clientUUID)}"
+
+    @classmethod
+    def wip_headers(cls, clientUUID, version):
+        # clients and proxies may keep the response but must check it is still current before using it
+        return {"ETag": f'"{cls.wip_etag(clientUUID, version)}"', "Cache-Control": "no-cache"}
+
+    @classmethod
+    def not_modified_response(cls, clientUUID, version):
+        return Response(status=304, headers=cls.wip_headers(clientUUID, version))
+
+    @staticmethod
+    def requested_view():
+        view = request.args.get("view", settings.RESULTS_DEFAULT_VIEW)
+        if view not in RESULT_VIEWS:
+            api.abort(400, f"view must be one of {RESULT_VIEWS}")
+        return view
+
+    @staticmethod
+    def results_view(results, view):
+        if view == "summary" and "error_summary" in results:
+            return {**results, "parsed_report": {}, "full_report": {}}
         return results
+
+    @classmethod
+    def wait_for_results(cls, clientUUID, wait, version):
+        """
+        Block until the client's job finishes or wait seconds passed, woken by the job's events. version is the revision of
+        the job read before the caller last read the job store. Returns ( results, revision read before the results were );
+        the results are None on a timeout and right away when too many clients are already waiting.
+        """
+        notifier = get_job_notifier()
+        deadline = time.monotonic() + wait
+        try:
+            with notifier.waiter():
+                while True:
+                    # read the version first so an event published while the job store is read is not missed
+                    version = notifier.version(clientUUID)
+                    results = cls.finished_results(clientUUID)
+                    remaining = deadline - time.monotonic()
+                    if results is not None or remaining <= 0:
+                        return results, version
+                    notifier.wait(clientUUID, version, remaining)
+        except WaiterLimitError:
+            return None, version
+
+    @staticmethod
+    def wait_for_change(clientUUID, version, wait):
+        """
+        Block until the revision of the client's job is no longer version or wait seconds passed and return the revision.
+        """
+        notifier = get_job_notifier()
+        try:
+            with notifier.waiter():
+                return notifier.wait(clientUUID, version, wait)
+        except WaiterLimitError:
+            return version
+
+    @staticmethod
+    def finished_results(clientUUID):
+        """
+        Return the finished results of the client, None while its job runs and abort with a 404 for a clientUUID without a
+        job ( never submitted, or its results expired ).
+        """
+        job = get_job_store().get_job(clientUUID)
+        if job is None:
+            api.abort(404, f"{clientUUID}: No validation job is known for this client")
+        if job["finished_at"] is None:
+            return None
+
+        results = load_results(clientUUID, job)
+        if results is None:
+            api.abort(404, f"{clientUUID}: The validation results expired")
+        return results
+
+    @staticmethod
+    def wip_response(clientUUID):
+        # queue_position is 0 while the job runs and the 1-based place in line while it waits for a worker
+        job_record = JobRecord.load(clientUUID)
+        return {
+            "status": "WIP",
+            "queue_position": get_worker_pool().queue_position(clientUUID),
+            "progress": job_record.to_dict() if job_record else {},
+            "parsed_report": {},
+            "full_report": {},
+        }
+
+
+def server_sent_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@api.route('/results/<string:clientUUID>/events')
+class ValidateDatasetLocalResultEvents(Resource):
+    @api.doc(responses={200: "Success", 400: "Bad Request", 404: "Unknown or expired clientUUID", 503: "Too many clients are waiting"},
+             params={"view": "full ( every parsed error ) or summary ( errors grouped by path template and message )"})
+    def get(self, clientUUID):
+        """
+        Stream the progress of a validation job as Server-Sent Events: a progress event every time the job moves on,
+        then a result event holding the results, after which the stream ends
+        """
+        view = ValidateDatasetLocalResult.requested_view()
+        # answer an unknown clientUUID with a 404 before starting the stream
+        ValidateDatasetLocalResult.finished_results(clientUUID)
+
+        waiter = get_job_notifier().waiter()
+        try:
+            waiter.__enter__()
+        except WaiterLimitError as e:
+            return {"message": str(e)}, 503, {"Retry-After": str(settings.SSE_HEARTBEAT_SECONDS)}
+
+        response = Response(self.stream(clientUUID, view), mimetype="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+        # the waiting place is given back however the stream ends, including clients that disconnect
+        response.call_on_close(lambda: waiter.__exit__(None, None, None))
+        return response
+
+    @staticmethod
+    def stream(clientUUID, view):
+        notifier = get_job_notifier()
+        deadline = time.monotonic() + settings.SSE_MAX_SECONDS
+        last_progress = None
+        while True:
+            version = notifier.version(clientUUID)
+            job = get_job_store().get_job(clientUUID)
+            if job is None:
+                yield server_sent_event("error", {"message": f"{clientUUID}: No validation job is known for this client"})
+                return
+
+            if job["finished_at"] is not None:
+                results = load_results(clientUUID, job)
+                if results is None:
+                    yield server_sent_event("error", {"message": f"{clientUUID}: The validation results expired"})
+                else:
+                    yield server_sent_event("result", ValidateDatasetLocalResult.results_view(results, view))
+                return
+
+            if job["progress"] != last_progress:
+                last_progress = job["progress"]
+                yield server_sent_event("progress", {"status": "WIP", "queue_position": get_worker_pool().queue_position(clientUUID), "progress": last_progress})
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                # clients reconnect and get the current progress first
+                return
+            if notifier.wait(clientUUID, version, min(settings.SSE_HEARTBEAT_SECONDS, remaining)) == version:
+                yield ": keep-alive\n\n"
+
+
+@api.route('/results/<string:clientUUID>/parsed_report')
+class ValidateDatasetLocalParsedReport(Resource):
+    @api.doc(responses={200: "Success", 400: "Bad Request"},
+             params={
+                 "cursor": "next_cursor of the previous page",
+                 "limit": "Number of entries per page",
+                 "path_prefix": "Only errors at or below this path, e.g. #/meta ( may be repeated )",
+                 "message": "Only errors with a message containing this text ( case insensitive )",
+             })
+    def get(self, clientUUID):
+        """
+        Page through the parsed report of a finished validation
+        """
+        results = ValidateDatasetLocalResult.finished_results(clientUUID)
+        if results is None:
+            return ValidateDatasetLocalResult.wip_response(clientUUID)
+
+        try:
+            limit = int(request.args.get("limit", settings.PARSED_REPORT_PAGE_SIZE))
+        except ValueError:
+            api.abort(400, "limit must be an integer")
+        if limit < 1 or limit > settings.PARSED_REPORT_MAX_PAGE_SIZE:
+            api.abort(400, f"limit must be between 1 and {settings.PARSED_REPORT_MAX_PAGE_SIZE}")
+
+        offset = 0
+        if request.args.get("cursor"):
+            try:
+                offset = decode_cursor(request.args["cursor"], results)
+            except InvalidCursorError as e:
+                api.abort(400, f"{clientUUID}: {e}")
+
+        entries = filter_parsed_report(results.get("parsed_report", {}), request.args.getlist("path_prefix"), request.args.get("message"))
+        page = entries[offset:offset + limit]
+        next_offset = offset + len(page)
+
+        return {
+            "status": results["status"],
+            "total": len(entries),
+            "parsed_report": dict(page),
+            "next_cursor": encode_cursor(next_offset, results) if next_offset < len(entries) else None,
+        }
+
+
+@api.route('/results/<string:clientUUID>/full_report')
+class ValidateDatasetLocalFullReport(Resource):
+    @api.doc(responses={200: "Success", 400: "Bad Request", 404: "Unknown or expired clientUUID, or no full report", 409: "The validation is still running"},
+             params={"pointer": "JSON pointer ( RFC 6901 ) selecting part of the report, e.g. /status/path_error_report"})
+    def get(self, clientUUID):
+        """
+        Get the full sparcur report of a finished validation as JSON
+        """
+        # the job decides whether there is a report, a file left on disk may belong to a run that was replaced or expired
+        results = ValidateDatasetLocalResult.finished_results(clientUUID)
+        if results is None:
+            api.abort(409, f"{clientUUID}: The validation is still running")
+        if not results.get("full_report_available"):
+            api.abort(404, f"{clientUUID}: No full report is available for a validation that finished with status {results['status']}")
+
+        stored = read_compressed_full_report(clientUUID)
+        if stored is None:
+            api.abort(404, f"{clientUUID}: No full report is available")
+
+        body, encoding = stored
+        pointer = request.args.get("pointer")
+        if pointer is None:
+            # the report is stored compressed, hand it over as is to a client that accepts the encoding
+            if request.accept_encodings.best_match([encoding]) is not None:
+                return Response(body, mimetype="application/json", headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding"})
+            return Response(decompress_report(body, encoding), mimetype="application/json")
+
+        try:
+            selected = resolve_json_pointer(decode_report(decompress_report(body, encoding)), pointer)
+        except JSONPointerError as e:
+            api.abort(404 if pointer.startswith(("/", "#/")) else 400, f"{clientUUID}: {e}")
+        return Response(json.dumps(selected), mimetype="application/json")
+
+
+@api.route('/cache')
+class ValidationResultCacheStats(Resource):
+    def get(self):
+        """
+        Get the hit, miss and eviction counts of the validation result cache
+        """
+        cache = get_result_cache()
+        if cache is None:
+            return {"enabled": False}
+        return {"enabled": True, **cache.stats()}
+
+
+@api.route('/jobs')
+class ValidationJobStats(Resource):
+    def get(self):
+        """
+        Get the number of jobs per status and the bytes taken by the stored results
+        """
+        return get_job_store().stats()
@@ -6,30 +6,56 @@ import sys
 from werkzeug.middleware.proxy_fix import ProxyFix
 from waitress import serve
 
-configure_namespaces()
 
-from setupUtils import (configureLogger, configureRouteHandlers, configureAPI)
+def create_app():
+    """
+    Build the Flask application. Kept out of module scope since every spawned validation worker imports this module
+    again ( as __mp_main__ ) and must not set up a second app, logger and set of routes.
+    """
+    configure_namespaces()
 
-app = Flask(__name__)
+    # NOTE: imported here since the route handlers need the namespaces configured above
+    from setupUtils import (configureLogger, configureRouteHandlers, configureAPI, configureCompression, configureMetrics)
 
-configureLogger(app)
+    app = Flask(__name__)
 
-app.logger.info("Starting SODA-for-SPARC-Validation-Server")
+    configureLogger(app)
 
-api = configureAPI()
+    configureCompression(app)
 
-configureRouteHandlers(api)
+    configureMetrics(app)
 
-@api.route("/hi")
-class Shutdown(Resource):
-    def get(self):
-        return "Hello"
+    app.logger.info("Starting SODA-for-SPARC-Validation-Server")
 
-app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1, x_prefix=1)
+    api = configureAPI()
 
-api.init_app(app)
+    configureRouteHandlers(api)
+
+    @api.route("/hi")
+    class Shutdown(Resource):
+        def get(self):
+            return "Hello"
+
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1, x_prefix=1)
+
+    api.init_app(app)
+
+    return app
 
 
 if __name__ == '__main__':
-    api.logger.info(f"Starting server on port {4000}")
-    serve(app, host='127.0.0.1', port=4000)
\ No newline at end of file
+    app = create_app()
+
+    from workerPool import get_worker_pool
+    from resultStore import start_result_sweeper
+    from serverMetrics import start_skeleton_usage_refresher
+    from serverConfig import settings
+
+    app.logger.info(f"Starting server on port {4000}")
+    # start the pre-warmed validation workers before accepting requests
+    get_worker_pool()
+    # remove expired results in the background instead of while answering polls
+    start_result_sweeper()
+    # measure the skeletons' disk usage in the background so /metrics only reads the last numbers
+    start_skeleton_usage_refresher()
+    serve(app, host='127.0.0.1', port=4000, threads=settings.SERVER_THREADS)
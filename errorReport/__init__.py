@@ -0,0 +1,3 @@
+from .pathReportReducer import reduce_error_path_report, split_path
+from .errorSummary import summarize_error_report, path_template
+from .fullReport import write_full_report, write_compressed_full_report, read_full_report, read_compressed_full_report, has_full_report, delete_full_report, decode_report, decompress_report, resolve_json_pointer, JSONPointerError
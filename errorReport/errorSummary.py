@@ -0,0 +1,46 @@
+"""
+Aggregated view of a parsed report. Large datasets repeat the same schema error for thousands of manifest rows or subject
+entries; the summary groups errors by path template ( array indices collapsed to * ) and message and keeps a count and a
+few concrete paths of every group.
+"""
+
+from serverConfig import settings
+from .pathReportReducer import split_path
+
+
+INDEX_PLACEHOLDER = "*"
+
+
+def path_template(path):
+    """
+    Collapse the array indices of a JSON pointer path: #/subjects/12/age -> #/subjects/*/age
+    """
+    return "/".join(INDEX_PLACEHOLDER if segment.isdigit() else segment for segment in split_path(path))
+
+
+def summarize_error_report(parsed_report, sample_size=None):
+    """
+    Return the groups of ( path template, message ) of parsed_report, largest first, each with its count and up to
+    sample_size of its concrete paths.
+    """
+    sample_size = settings.ERROR_SUMMARY_SAMPLE_PATHS if sample_size is None else sample_size
+
+    groups = {}
+    message_count = 0
+    for path, error in parsed_report.items():
+        template = path_template(path)
+        for message in error.get("messages", []) if isinstance(error, dict) else []:
+            message_count += 1
+            key = (template, str(message))
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = {"path_template": template, "message": str(message), "count": 0, "sample_paths": []}
+            group["count"] += 1
+            if len(group["sample_paths"]) < sample_size:
+                group["sample_paths"].append(path)
+
+    return {
+        "path_count": len(parsed_report),
+        "message_count": message_count,
+        "groups": sorted(groups.values(), key=lambda group: group["count"], reverse=True),
+    }
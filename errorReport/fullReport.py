@@ -0,0 +1,155 @@
+"""
+Storage of the full sparcur validation blob. The blob is serialized as real JSON ( sparcur paths and identifiers become
+strings ), compressed with zstd ( gzip without the zstandard package ) and kept in its own file next to the results, so the
+results stay small and only clients that need the full report download it.
+"""
+
+import datetime
+import gzip
+import json
+import os
+
+from serverConfig import settings, storage
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class JSONPointerError(LookupError):
+    """
+    Raised when a JSON pointer is malformed or does not resolve in the document.
+    """
+
+
+def _encode_default(obj):
+    # sparcur paths, identifiers ( OntId, RemoteId, ... ) and the like are reported by their string form
+    if isinstance(obj, os.PathLike):
+        return os.fspath(obj)
+    if isinstance(obj, (datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if isinstance(obj, bytes):
+        return obj.decode("utf-8", errors="replace")
+    return str(obj)
+
+
+def encode_blob(blob):
+    """
+    Serialize the sparcur blob as UTF-8 JSON bytes.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(blob, default=_encode_default, option=orjson.OPT_NON_STR_KEYS)
+        except (TypeError, orjson.JSONEncodeError):
+            # e.g. integers wider than 64 bits, the standard library encoder handles them
+            pass
+    return json.dumps(blob, default=_encode_default).encode("utf-8")
+
+
+def decode_report(body):
+    return orjson.loads(body) if orjson is not None else json.loads(body)
+
+
+def storage_encoding():
+    return "zstd" if zstandard is not None else "gzip"
+
+
+def _compress(body, encoding):
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=settings.ZSTD_COMPRESSION_LEVEL).compress(body)
+    return gzip.compress(body, compresslevel=settings.GZIP_COMPRESSION_LEVEL)
+
+
+def decompress_report(body, encoding):
+    if encoding == "zstd":
+        return zstandard.ZstdDecompressor().decompressobj().decompress(body)
+    return gzip.decompress(body)
+
+
+def write_full_report(clientUUID, blob):
+    """
+    Store the client's full report, replacing a previous one.
+    """
+    encoding = storage_encoding()
+    write_compressed_full_report(clientUUID, _compress(encode_blob(blob), encoding), encoding)
+
+
+def write_compressed_full_report(clientUUID, body, encoding):
+    """
+    Store an already compressed full report ( e.g. one kept by the result cache ), replacing a previous one.
+    """
+    delete_full_report(clientUUID)
+    report_file = storage.full_report_file(clientUUID, encoding)
+    os.makedirs(os.path.dirname(report_file), exist_ok=True)
+
+    temp_file = f"{report_file}.{os.getpid()}.tmp"
+    with open(temp_file, "wb") as f:
+        f.write(body)
+    os.replace(temp_file, report_file)
+
+
+def read_compressed_full_report(clientUUID):
+    """
+    Return ( compressed bytes, encoding ) of the client's stored full report or None when it has none.
+    """
+    for encoding in storage.FULL_REPORT_ENCODINGS:
+        try:
+            with open(storage.full_report_file(clientUUID, encoding), "rb") as f:
+                return f.read(), encoding
+        except FileNotFoundError:
+            continue
+    return None
+
+
+def read_full_report(clientUUID):
+    """
+    Return the client's full report as JSON bytes or None when it has none.
+    """
+    stored = read_compressed_full_report(clientUUID)
+    if stored is None:
+        return None
+    return decompress_report(*stored)
+
+
+def has_full_report(clientUUID):
+    return any(os.path.exists(storage.full_report_file(clientUUID, encoding)) for encoding in storage.FULL_REPORT_ENCODINGS)
+
+
+def delete_full_report(clientUUID):
+    for encoding in storage.FULL_REPORT_ENCODINGS:
+        try:
+            os.remove(storage.full_report_file(clientUUID, encoding))
+        except FileNotFoundError:
+            pass
+
+
+def resolve_json_pointer(document, pointer):
+    """
+    Return the value pointer ( RFC 6901, e.g. /status/path_error_report/#~1meta ) selects in document.
+    A leading # ( the URI fragment form ) is accepted.
+    """
+    if pointer.startswith("#"):
+        pointer = pointer[1:]
+    if pointer == "":
+        return document
+    if not pointer.startswith("/"):
+        raise JSONPointerError(f"A JSON pointer must start with /: {pointer}")
+
+    value = document
+    for token in pointer[1:].split("/"):
+        token = token.replace("~1", "/").replace("~0", "~")
+        if isinstance(value, dict) and token in value:
+            value = value[token]
+        elif isinstance(value, list) and token.isdigit() and int(token) < len(value):
+            value = value[int(token)]
+        else:
+            raise JSONPointerError(f"{pointer} does not resolve in the full report")
+    return value
@@ -0,0 +1,48 @@
+"""
+Reduces sparcur's path_error_report ( JSON pointer path -> error object ) to the errors shown to the user.
+As per Tom ( developer of the Validator ) only the paths that do not have any errors in their subpaths are returned,
+e.g. given #/meta and #/meta/technique only #/meta/technique is returned.
+
+The paths are inserted into a trie of their segments so every path's descendants are known after one pass over the report,
+and the returned report references the original error objects instead of a deep copy of the whole report.
+"""
+
+from serverConfig import settings
+
+
+def split_path(path):
+    """
+    Split a JSON pointer path ( "#/a/b/0" ) into its segments ( ["#", "a", "b", "0"] ).
+    """
+    return path.split("/")
+
+
+def _is_filtered(segments, filters):
+    return any(segment in filters for segment in segments)
+
+
+def reduce_error_path_report(error_path_report, filters=None):
+    """
+    Return the leaf error paths of error_path_report, in the order of the report, skipping every path that has a segment
+    in filters ( defaults to settings.ERROR_REPORT_PATH_FILTERS, e.g. the #/inputs subtree ).
+    A filtered path does not hide its parent.
+    """
+    filters = set(settings.ERROR_REPORT_PATH_FILTERS if filters is None else filters)
+
+    root = {}
+    nodes = {}
+    for path in error_path_report:
+        segments = split_path(path)
+        if _is_filtered(segments, filters):
+            continue
+
+        node = root
+        for segment in segments:
+            child = node.get(segment)
+            if child is None:
+                child = node[segment] = {}
+            node = child
+        nodes[path] = node
+
+    # a path is a leaf when no other reported path was inserted below its node
+    return {path: error_path_report[path] for path, node in nodes.items() if not node}
@@ -0,0 +1 @@
+from .jobNotifier import JobNotifier, WaiterLimitError, get_job_notifier
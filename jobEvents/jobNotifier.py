@@ -0,0 +1,108 @@
+"""
+In-process notifications of job progress and completion. The worker pool and the request threads publish an event every
+time a job's progress record changes or the job finishes, and long-polling / SSE requests block on the client's events
+instead of polling the job store. An event only says that something changed: waiters read the new state from the job store.
+
+The notifier doubles as an in-memory index of job revisions: every event gives the client a new revision, so a poll whose
+ETag carries the current revision is answered with a 304 without reading the job store.
+"""
+
+import collections
+import itertools
+import threading
+import uuid
+
+from serverConfig import settings
+
+
+class WaiterLimitError(Exception):
+    """
+    Raised when MAX_WAITING_CLIENTS requests are already blocked waiting for job events.
+    """
+
+
+class JobNotifier:
+    def __init__(self, max_waiters, max_tracked_jobs=10000):
+        self.max_waiters = max_waiters
+        self.max_tracked_jobs = max_tracked_jobs
+        self._condition = threading.Condition()
+        # identifies this server run in ETags, revisions handed out by an earlier run must not match
+        self.run_id = uuid.uuid4().hex[:12]
+        # clientUUID -> revision of the client's job, least recently changed client first. Revisions come from one sequence
+        # so a client that is dropped from the index and tracked again never gets a revision it had before.
+        self._versions = collections.OrderedDict()
+        self._sequence = itertools.count(1)
+        self._waiters = 0
+
+    def _set_version(self, clientUUID):
+        # NOTE: caller must hold self._condition
+        self._versions[clientUUID] = next(self._sequence)
+        self._versions.move_to_end(clientUUID)
+        while len(self._versions) > self.max_tracked_jobs:
+            self._versions.popitem(last=False)
+        return self._versions[clientUUID]
+
+    def publish(self, clientUUID):
+        """
+        Give the client's job a new revision and wake every request waiting for an event of clientUUID.
+        """
+        with self._condition:
+            self._set_version(clientUUID)
+            self._condition.notify_all()
+
+    def version(self, clientUUID):
+        """
+        Return the revision of the client's job, to be passed to wait after reading the job's state.
+        A client the index does not know yet is given a revision.
+        """
+        with self._condition:
+            version = self._versions.get(clientUUID)
+            return version if version is not None else self._set_version(clientUUID)
+
+    def wait(self, clientUUID, version, timeout):
+        """
+        Block until the revision of the client's job is no longer version or timeout seconds passed.
+        Returns the current revision, which equals version on a timeout.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._versions.get(clientUUID) != version, timeout=timeout)
+            return self.version(clientUUID)
+
+    def waiter(self):
+        """
+        Context manager holding one of the max_waiters places for a request that blocks on events.
+        Raises WaiterLimitError when every place is taken so blocked requests can not use up the server threads.
+        """
+        return _WaiterSlot(self)
+
+
+class _WaiterSlot:
+    def __init__(self, notifier):
+        self.notifier = notifier
+
+    def __enter__(self):
+        with self.notifier._condition:
+            if self.notifier._waiters >= self.notifier.max_waiters:
+                raise WaiterLimitError("Too many clients are waiting for results")
+            self.notifier._waiters += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        with self.notifier._condition:
+            self.notifier._waiters -= 1
+        return False
+
+
+_notifier = None
+_notifier_lock = threading.Lock()
+
+
+def get_job_notifier():
+    """
+    Return the process wide job notifier.
+    """
+    global _notifier
+    with _notifier_lock:
+        if _notifier is None:
+            _notifier = JobNotifier(settings.MAX_WAITING_CLIENTS)
+        return _notifier
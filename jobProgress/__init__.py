@@ -0,0 +1 @@
+from .jobRecord import JobRecord, STAGES, delete_job_record, add_progress_listener, notify_progress
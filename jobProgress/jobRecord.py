@@ -0,0 +1,127 @@
+"""
+Per job progress record. Every validation job gets its own record ( keyed by clientUUID ) holding the stage it is currently in
+and when each stage of the pipeline started and finished. The record is shared between the server process, which builds
+the skeleton, and the worker process, which cleans, validates and parses, so it is persisted in the job store.
+"""
+
+import time
+from contextlib import contextmanager
+
+from jobStore import get_job_store
+
+
+# the stages of the validation pipeline in the order they run
+STAGES = ["skeleton", "metadata", "manifests", "clean", "validate", "parse"]
+
+# called with the clientUUID every time a record changes
+_progress_listeners = []
+
+
+def add_progress_listener(listener):
+    """
+    Register listener(clientUUID) to be called every time a progress record is saved in this process
+    ( or notify_progress reports a change made by another process ).
+    """
+    _progress_listeners.append(listener)
+
+
+def notify_progress(clientUUID):
+    for listener in _progress_listeners:
+        listener(clientUUID)
+
+
+class JobRecord:
+    def __init__(self, clientUUID, data=None):
+        self.clientUUID = clientUUID
+        self.data = data or {
+            "clientUUID": clientUUID,
+            "current_stage": None,
+            "created_at": time.time(),
+            "stages": {},
+        }
+
+    @classmethod
+    def load(cls, clientUUID):
+        """
+        Return the persisted record for clientUUID or None if the job has no record.
+        """
+        job = get_job_store().get_job(clientUUID)
+        if job is None or not job["progress"]:
+            return None
+        return cls(clientUUID, job["progress"])
+
+    def register(self):
+        """
+        Start tracking the record as the client's new job, dropping the status and results of its previous job.
+        """
+        get_job_store().create_job(self.clientUUID, self.data)
+        notify_progress(self.clientUUID)
+
+    def start_stage(self, stage):
+        self.data["current_stage"] = stage
+        self.data["stages"][stage] = {"started_at": time.time(), "finished_at": None, "duration_seconds": None}
+        self.save()
+
+    def finish_stage(self, stage):
+        timing = self.data["stages"][stage]
+        timing["finished_at"] = time.time()
+        timing["duration_seconds"] = round(timing["finished_at"] - timing["started_at"], 3)
+        self.save()
+
+    def record_stage(self, stage, started_at, finished_at):
+        """
+        Record a stage that was timed outside of the record ( e.g. before the job's clientUUID was known ).
+        """
+        self.data["stages"][stage] = {
+            "started_at": started_at,
+            "finished_at": finished_at,
+            "duration_seconds": round(finished_at - started_at, 3),
+        }
+        self.save()
+
+    def annotate_stage(self, stage, **details):
+        """
+        Add details ( e.g. a breakdown of the stage's time ) to the timing of a recorded stage.
+        """
+        self.data["stages"][stage].update(details)
+        self.save()
+
+    @contextmanager
+    def stage(self, stage):
+        """
+        Time the body of the with block as the given pipeline stage. A stage that raises keeps its start time and no finish
+        time so the record shows where the job stopped.
+        """
+        self.start_stage(stage)
+        yield
+        self.finish_stage(stage)
+
+    def mark_queued(self):
+        """
+        Record that the job is waiting for a validation worker.
+        """
+        self.data["current_stage"] = "queued"
+        self.data["queued_at"] = time.time()
+        self.save()
+
+    def finish(self, status):
+        self.data["current_stage"] = None
+        self.data["status"] = status
+        self.data["finished_at"] = time.time()
+        self.data["total_seconds"] = round(self.data["finished_at"] - self.data["created_at"], 3)
+        self.save()
+
+    def to_dict(self):
+        return self.data
+
+    def save(self):
+        get_job_store().save_progress(self.clientUUID, self.data)
+        notify_progress(self.clientUUID)
+
+
+def delete_job_record(clientUUID):
+    """
+    Remove the persisted record for clientUUID, if any.
+    """
+    get_job_store().delete_job(clientUUID)
+    notify_progress(clientUUID)
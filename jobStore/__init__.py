@@ -0,0 +1 @@
+from .sqliteJobStore import JobStore, get_job_store, WIP_STATUS
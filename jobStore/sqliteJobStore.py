@@ -0,0 +1,163 @@
+"""
+Embedded store of validation jobs, one row per clientUUID, in an SQLite database in WAL mode. It is shared by the server
+process and the validation workers: the progress record, the status, the timestamps and where the results are kept are
+all looked up by clientUUID instead of being implied by which files exist.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from serverConfig import settings
+
+
+# status of a job that has not finished yet
+WIP_STATUS = "WIP"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    client_uuid TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    finished_at REAL,
+    progress TEXT,
+    results_path TEXT,
+    results_bytes INTEGER NOT NULL DEFAULT 0,
+    full_report_bytes INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS jobs_finished_at ON jobs (finished_at);
+"""
+
+_COLUMNS = ["client_uuid", "status", "created_at", "updated_at", "finished_at", "progress", "results_path", "results_bytes", "full_report_bytes"]
+
+
+class JobStore:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        # sqlite connections can not be shared between threads, every thread opens its own
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            connection = sqlite3.connect(self.db_path, timeout=settings.JOB_STORE_BUSY_TIMEOUT_SECONDS, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(_SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def _row(self, row):
+        if row is None:
+            return None
+        job = dict(zip(_COLUMNS, row))
+        job["progress"] = json.loads(job["progress"]) if job["progress"] else {}
+        return job
+
+    def create_job(self, clientUUID, progress):
+        """
+        Start tracking a new job of the client, replacing whatever was kept for its previous job.
+        """
+        now = time.time()
+        self._connection().execute(
+            "INSERT OR REPLACE INTO jobs (client_uuid, status, created_at, updated_at, progress) VALUES (?, ?, ?, ?, ?)",
+            (clientUUID, WIP_STATUS, now, now, json.dumps(progress)),
+        )
+
+    def save_progress(self, clientUUID, progress):
+        """
+        Store the progress record of the client's job, creating the job when the store does not know it yet.
+        """
+        now = time.time()
+        self._connection().execute(
+            "INSERT INTO jobs (client_uuid, status, created_at, updated_at, progress) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (client_uuid) DO UPDATE SET progress = excluded.progress, updated_at = excluded.updated_at",
+            (clientUUID, WIP_STATUS, now, now, json.dumps(progress)),
+        )
+
+    def reopen_job(self, clientUUID):
+        """
+        Mark the client's job as running again, dropping the reference to the results of its previous run.
+        """
+        self._connection().execute(
+            "UPDATE jobs SET status = ?, updated_at = ?, finished_at = NULL, results_path = NULL, results_bytes = 0, full_report_bytes = 0 "
+            "WHERE client_uuid = ?",
+            (WIP_STATUS, time.time(), clientUUID),
+        )
+
+    def finish_job(self, clientUUID, status, results_path, results_bytes, full_report_bytes=0, progress=None):
+        now = time.time()
+        self._connection().execute(
+            "INSERT INTO jobs (client_uuid, status, created_at, updated_at, finished_at, progress, results_path, results_bytes, full_report_bytes) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (client_uuid) DO UPDATE SET status = excluded.status, updated_at = excluded.updated_at, "
+            "finished_at = excluded.finished_at, progress = COALESCE(excluded.progress, progress), "
+            "results_path = excluded.results_path, results_bytes = excluded.results_bytes, full_report_bytes = excluded.full_report_bytes",
+            (clientUUID, status, now, now, now, json.dumps(progress) if progress is not None else None, results_path, results_bytes, full_report_bytes),
+        )
+
+    def get_job(self, clientUUID):
+        """
+        Return the client's job as a dictionary or None when the store does not know the client.
+        """
+        cursor = self._connection().execute(f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE client_uuid = ?", (clientUUID,))
+        return self._row(cursor.fetchone())
+
+    def delete_job(self, clientUUID):
+        self._connection().execute("DELETE FROM jobs WHERE client_uuid = ?", (clientUUID,))
+
+    def unfinished_jobs(self):
+        cursor = self._connection().execute("SELECT client_uuid FROM jobs WHERE finished_at IS NULL")
+        return [row[0] for row in cursor.fetchall()]
+
+    def expired_jobs(self, ttl_seconds):
+        """
+        Return the clientUUIDs of the jobs that finished more than ttl_seconds ago.
+        """
+        cursor = self._connection().execute("SELECT client_uuid FROM jobs WHERE finished_at < ?", (time.time() - ttl_seconds,))
+        return [row[0] for row in cursor.fetchall()]
+
+    def jobs_over_budget(self, max_bytes):
+        """
+        Return the clientUUIDs of the oldest finished jobs that have to go for the stored results to fit in max_bytes.
+        """
+        connection = self._connection()
+        total_bytes = connection.execute("SELECT COALESCE(SUM(results_bytes + full_report_bytes), 0) FROM jobs").fetchone()[0]
+        over_budget = []
+        if total_bytes <= max_bytes:
+            return over_budget
+
+        cursor = connection.execute(
+            "SELECT client_uuid, results_bytes + full_report_bytes FROM jobs WHERE finished_at IS NOT NULL ORDER BY finished_at"
+        )
+        for clientUUID, size in cursor:
+            if total_bytes <= max_bytes:
+                break
+            over_budget.append(clientUUID)
+            total_bytes -= size
+        return over_budget
+
+    def stats(self):
+        connection = self._connection()
+        counts = dict(connection.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        total_bytes = connection.execute("SELECT COALESCE(SUM(results_bytes + full_report_bytes), 0) FROM jobs").fetchone()[0]
+        return {"jobs": counts, "result_bytes": total_bytes}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_job_store():
+    """
+    Return the process wide job store.
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = JobStore(settings.JOB_STORE_PATH)
+        return _store
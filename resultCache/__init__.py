@@ -0,0 +1,2 @@
+from .validationResultCache import ValidationResultCache, compute_cache_key, compute_stream_cache_key, get_result_cache, cache_finished_result
+from .canonicalDigest import CanonicalDigest, canonical_digest
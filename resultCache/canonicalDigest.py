@@ -0,0 +1,126 @@
+"""
+Canonical digests of JSON values. Objects hash the sorted digests of their members, so key order and whitespace do not
+matter, and a value hashes the same whether it was parsed into Python objects or read as ijson events from a streamed body.
+Both are walked without recursion so deeply nested dataset structures can not exhaust the recursion limit.
+"""
+
+import hashlib
+from decimal import Decimal
+
+
+def _hash(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part)
+    return digest.digest()
+
+
+def _scalar_digest(value):
+    # bool before int: True is an int to python; ijson reports non-integer numbers as Decimal where json gives a float
+    if value is None:
+        return _hash(b"n")
+    if isinstance(value, bool):
+        return _hash(b"t" if value else b"f")
+    if isinstance(value, int):
+        return _hash(b"i", str(value).encode("ascii"))
+    if isinstance(value, (float, Decimal)):
+        return _hash(b"d", repr(float(value)).encode("ascii"))
+    return _hash(b"s", str(value).encode("utf-8"))
+
+
+class CanonicalDigest:
+    """
+    Digest of a JSON document fed with its ijson basic_parse events. Besides the digest of the whole document the digests of
+    the members of a top level object are kept in member_digests ( key -> hex digest ).
+    """
+
+    def __init__(self):
+        self.member_digests = {}
+        self.digest = None
+        # frames are [ is_map, member digests, key of the member being read ]
+        self._stack = []
+
+    def event(self, event, value):
+        if event in ("start_map", "start_array"):
+            self._stack.append([event == "start_map", [], None])
+        elif event == "map_key":
+            self._stack[-1][2] = value
+        elif event in ("end_map", "end_array"):
+            is_map, members, _ = self._stack.pop()
+            if is_map:
+                self._add(_hash(b"m", *sorted(members)))
+            else:
+                self._add(_hash(b"a", *members))
+        else:
+            self._add(_scalar_digest(value))
+
+    def _add(self, digest):
+        if not self._stack:
+            self.digest = digest.hex()
+            return
+
+        is_map, members, key = self._stack[-1]
+        if len(self._stack) == 1 and is_map:
+            # the top level object keeps the digests of its members instead of the members themselves
+            self.member_digests[key] = digest.hex()
+            members.append(_hash(_scalar_digest(key), digest))
+        elif is_map:
+            members.append(_hash(_scalar_digest(key), digest))
+        else:
+            members.append(digest)
+
+
+def _events(value):
+    # the ijson basic_parse events of a parsed JSON value
+    stack = [iter([value])]
+    while stack:
+        try:
+            item = next(stack[-1])
+        except StopIteration:
+            finished = stack.pop()
+            # the bottom of the stack holds the value itself, not a container
+            if stack:
+                yield finished.end_event, None
+            continue
+
+        if isinstance(stack[-1], _MapMembers):
+            key, item = item
+            yield "map_key", key
+        if isinstance(item, dict):
+            yield "start_map", None
+            stack.append(_MapMembers(item))
+        elif isinstance(item, (list, tuple)):
+            yield "start_array", None
+            stack.append(_ArrayItems(item))
+        else:
+            yield "scalar", item
+
+
+class _MapMembers:
+    end_event = "end_map"
+
+    def __init__(self, mapping):
+        self._items = iter(mapping.items())
+
+    def __next__(self):
+        return next(self._items)
+
+
+class _ArrayItems:
+    end_event = "end_array"
+
+    def __init__(self, items):
+        self._items = iter(items)
+
+    def __next__(self):
+        return next(self._items)
+
+
+def canonical_digest(value):
+    """
+    Return the hex digest of a parsed JSON value, the same CanonicalDigest computes from the value's events.
+    """
+    digest = CanonicalDigest()
+    for event, item in _events(value):
+        digest.event(event, item)
+    return digest.digest
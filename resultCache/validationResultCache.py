@@ -0,0 +1,262 @@
+"""
+Content addressed cache of finished validation results. The key is a hash of the canonicalized request payload so a user
+that validates an unchanged dataset again gets the previous result back without rebuilding the skeleton or running sparcur.
+Entries live on disk, bounded in total size ( least recently used entries are evicted first ) and expire after a TTL.
+"""
+
+import collections
+import hashlib
+import json
+import os
+import threading
+import time
+
+from apiVersion import get_api_version
+from namespaces import NamespaceEnum, get_namespace_logger
+from errorReport import read_compressed_full_report
+from serverConfig import settings, storage
+from .canonicalDigest import canonical_digest
+
+
+# bump when the layout of cached results or the way keys are computed changes so old entries are never served
+CACHE_FORMAT_VERSION = 3
+
+# only results of validation runs that actually finished are worth serving again
+CACHEABLE_STATUSES = ["Complete", "Incomplete"]
+
+# the members of a validation request that make up its cache key; clientUUID and the like are left out
+CACHE_KEY_MEMBERS = ["dataset_structure", "manifests", "metadata_files"]
+
+
+def _cache_key(member_digests):
+    # the API version is part of the key so an upgraded validator never serves results from an older one
+    parts = [str(CACHE_FORMAT_VERSION), get_api_version()["version"]] + [member_digests[member] for member in CACHE_KEY_MEMBERS]
+    return hashlib.sha256(":".join(parts).encode("utf-8")).hexdigest()
+
+
+def compute_cache_key(dataset_structure, manifests, metadata_files):
+    """
+    Hash the payload of a validation request. The payload is hashed canonically ( see canonicalDigest ) so the same dataset
+    always produces the same key no matter the order the client serialized it in or whether it was streamed.
+    """
+    return _cache_key({
+        "dataset_structure": canonical_digest(dataset_structure),
+        "manifests": canonical_digest(manifests),
+        "metadata_files": canonical_digest(metadata_files),
+    })
+
+
+def compute_stream_cache_key(member_digests):
+    """
+    Key for a request that was streamed in ( see validator.streamingIngest ) from the canonical digests of its members, which
+    are computed while the body is read. Matches compute_cache_key for the same payload.
+    """
+    return _cache_key(member_digests)
+
+
+class ValidationResultCache:
+    def __init__(self, cache_path, max_bytes, ttl_seconds):
+        self.cache_path = cache_path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.logger = get_namespace_logger(NamespaceEnum.VALIDATE_DATASET)
+        self._lock = threading.Lock()
+        # key -> (size in bytes, created at); ordered from least to most recently used
+        self._entries = collections.OrderedDict()
+        self._total_bytes = 0
+        self._load_index()
+
+    def get(self, key):
+        """
+        Return the cached results for key or None on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._is_expired(entry):
+                self._evict(key)
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            try:
+                with open(self._entry_file(key), "r") as f:
+                    results = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                self._evict(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return results
+
+    def get_full_report(self, key):
+        """
+        Return ( compressed bytes, encoding ) of the full report cached with key or None when there is none.
+        """
+        with self._lock:
+            for encoding in storage.FULL_REPORT_ENCODINGS:
+                try:
+                    with open(self._full_report_file(key, encoding), "rb") as f:
+                        return f.read(), encoding
+                except FileNotFoundError:
+                    continue
+            return None
+
+    def put(self, key, results, full_report=None):
+        """
+        Store the results of a finished validation run under key, with its compressed full report ( bytes, encoding ) if given.
+        Results that did not come from a finished run are ignored.
+        """
+        if results.get("status") not in CACHEABLE_STATUSES:
+            return
+
+        # the progress record describes the run that produced the result, not a later cache hit
+        cached_results = {k: v for k, v in results.items() if k != "progress"}
+        serialized = json.dumps(cached_results)
+        size = len(serialized.encode("utf-8")) + (len(full_report[0]) if full_report is not None else 0)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if not os.path.exists(self.cache_path):
+                os.makedirs(self.cache_path, exist_ok=True)
+
+            self._remove_full_reports(key)
+            if full_report is not None:
+                full_report_file = self._full_report_file(key, full_report[1])
+                with open(f"{full_report_file}.tmp", "wb") as f:
+                    f.write(full_report[0])
+                os.replace(f"{full_report_file}.tmp", full_report_file)
+
+            entry_file = self._entry_file(key)
+            temp_file = f"{entry_file}.tmp"
+            with open(temp_file, "w") as f:
+                f.write(serialized)
+            os.replace(temp_file, entry_file)
+
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)[0]
+            self._entries[key] = (size, time.time())
+            self._total_bytes += size
+
+            self._evict_to_fit()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0,
+            }
+
+    def _entry_file(self, key):
+        return os.path.join(self.cache_path, f"{key}.json")
+
+    def _full_report_file(self, key, encoding):
+        return os.path.join(self.cache_path, f"{key}.full_report.{storage.FULL_REPORT_ENCODINGS[encoding]}")
+
+    def _remove_full_reports(self, key):
+        for encoding in storage.FULL_REPORT_ENCODINGS:
+            try:
+                os.remove(self._full_report_file(key, encoding))
+            except FileNotFoundError:
+                pass
+
+    def _is_expired(self, entry):
+        return time.time() - entry[1] > self.ttl_seconds
+
+    def _load_index(self):
+        # rebuild the index from the entries left by a previous run, oldest first
+        if not os.path.exists(self.cache_path):
+            return
+
+        entries = []
+        for file_name in os.listdir(self.cache_path):
+            if not file_name.endswith(".json"):
+                continue
+            key = file_name[:-len(".json")]
+            stat = os.stat(os.path.join(self.cache_path, file_name))
+            size = stat.st_size
+            for encoding in storage.FULL_REPORT_ENCODINGS:
+                if os.path.exists(self._full_report_file(key, encoding)):
+                    size += os.path.getsize(self._full_report_file(key, encoding))
+            entries.append((stat.st_mtime, key, size))
+
+        for created_at, key, size in sorted(entries):
+            self._entries[key] = (size, created_at)
+            self._total_bytes += size
+
+        with self._lock:
+            self._evict_to_fit()
+
+    def _evict_to_fit(self):
+        # NOTE: caller must hold self._lock
+        for key in [key for key, entry in self._entries.items() if self._is_expired(entry)]:
+            self._evict(key)
+
+        while self._total_bytes > self.max_bytes and self._entries:
+            self._evict(next(iter(self._entries)))
+
+    def _evict(self, key):
+        # NOTE: caller must hold self._lock
+        size, _ = self._entries.pop(key)
+        self._total_bytes -= size
+        self.evictions += 1
+        try:
+            os.remove(self._entry_file(key))
+        except FileNotFoundError:
+            pass
+        self._remove_full_reports(key)
+        self.logger.info(f"Evicted cached validation result {key}")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    """
+    Return the process wide result cache or None when caching is disabled.
+    """
+    global _cache
+    if not settings.RESULT_CACHE_ENABLED:
+        return None
+
+    with _cache_lock:
+        if _cache is None:
+            _cache = ValidationResultCache(
+                settings.CACHE_ROOT,
+                settings.RESULT_CACHE_MAX_BYTES,
+                settings.RESULT_CACHE_TTL_SECONDS,
+            )
+        return _cache
+
+
+def cache_finished_result(job):
+    """
+    Completion listener for the worker pool: store the result of a job that was submitted with a cache_key.
+    """
+    cache = get_result_cache()
+    if cache is None or not job.get("cache_key"):
+        return
+
+    user_results_file = storage.results_file(job["clientUUID"])
+    try:
+        with open(user_results_file, "r") as f:
+            results = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        # the client already collected the result or it was never written
+        return
+
+    cache.put(job["cache_key"], results, read_compressed_full_report(job["clientUUID"]))
@@ -0,0 +1,2 @@
+from .resultFiles import load_results, save_results, discard_previous_results, delete_results, sweep_expired_results, start_result_sweeper
+from .resultFiles import filter_parsed_report, encode_cursor, decode_cursor, InvalidCursorError
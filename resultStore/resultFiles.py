@@ -0,0 +1,219 @@
+"""
+Finished validation results. Every result is written as a file and registered with the job store, which keeps its status,
+when it finished and where it is, so a poll is an indexed lookup. Results stay readable until they are RESULTS_TTL_SECONDS
+old ( instead of being removed by the first GET ) so clients can page through a large parsed report; a background sweeper
+then removes them, and removes the oldest ones early when all results take more than RESULTS_MAX_BYTES.
+"""
+
+import base64
+import collections
+import json
+import os
+import threading
+import time
+
+from errorReport import delete_full_report
+from jobProgress import notify_progress
+from jobStore import get_job_store
+from namespaces import NamespaceEnum, get_namespace_logger
+from serverConfig import settings, storage
+
+
+class InvalidCursorError(ValueError):
+    """
+    Raised for a pagination cursor that is malformed or belongs to an older result of the client.
+    """
+
+
+# ( results file, finished_at ) -> parsed results of the most recently read results, so paging does not re-read a large file
+_loaded = collections.OrderedDict()
+_loaded_lock = threading.Lock()
+
+
+def _full_report_bytes(clientUUID):
+    size = 0
+    for encoding in storage.FULL_REPORT_ENCODINGS:
+        try:
+            size += os.path.getsize(storage.full_report_file(clientUUID, encoding))
+        except FileNotFoundError:
+            pass
+    return size
+
+
+def save_results(clientUUID, results):
+    """
+    Write the finished results of the client's job and mark the job as finished with results["status"] in the job store.
+    The job's full report, if it has one, must already be written.
+    """
+    os.makedirs(settings.RESULTS_ROOT, exist_ok=True)
+
+    # write then rename so a reader never sees a half written results file
+    results_file = storage.results_file(clientUUID)
+    temp_file = f"{results_file}.{os.getpid()}.tmp"
+    with open(temp_file, "w") as f:
+        json.dump(results, f)
+    os.replace(temp_file, results_file)
+
+    get_job_store().finish_job(
+        clientUUID,
+        results["status"],
+        results_file,
+        os.path.getsize(results_file),
+        _full_report_bytes(clientUUID),
+        progress=results.get("progress"),
+    )
+    notify_progress(clientUUID)
+
+
+def discard_previous_results(clientUUID):
+    """
+    Remove the results of the client's previous job, which is about to run again.
+    """
+    _remove_result_files(clientUUID)
+    get_job_store().reopen_job(clientUUID)
+
+
+def _is_expired(job):
+    return time.time() - job["finished_at"] > settings.RESULTS_TTL_SECONDS
+
+
+def load_results(clientUUID, job=None):
+    """
+    Return the finished results of the client or None while there are none ( or they expired ).
+    job is the client's job as returned by the job store, it is looked up when not given.
+    NOTE: the returned dictionary is shared between readers and must not be modified.
+    """
+    job = job or get_job_store().get_job(clientUUID)
+    if job is None or job["finished_at"] is None or job["results_path"] is None:
+        return None
+
+    if _is_expired(job):
+        delete_results(clientUUID)
+        return None
+
+    key = (job["results_path"], job["finished_at"])
+    with _loaded_lock:
+        results = _loaded.get(key)
+        if results is not None:
+            _loaded.move_to_end(key)
+            return results
+
+    try:
+        with open(job["results_path"], "r") as f:
+            results = json.load(f)
+    except FileNotFoundError:
+        return None
+
+    with _loaded_lock:
+        _loaded[key] = results
+        while len(_loaded) > settings.RESULTS_MEMORY_CACHE_ENTRIES:
+            _loaded.popitem(last=False)
+    return results
+
+
+def _remove_result_files(clientUUID):
+    results_file = storage.results_file(clientUUID)
+    try:
+        os.remove(results_file)
+    except FileNotFoundError:
+        pass
+    delete_full_report(clientUUID)
+
+    with _loaded_lock:
+        for key in [key for key in _loaded if key[0] == results_file]:
+            del _loaded[key]
+
+
+def delete_results(clientUUID):
+    """
+    Remove everything kept for the client's finished validation, including its job.
+    """
+    _remove_result_files(clientUUID)
+    get_job_store().delete_job(clientUUID)
+
+
+def sweep_expired_results():
+    """
+    Remove every result older than RESULTS_TTL_SECONDS, then the oldest results while all of them take more than
+    RESULTS_MAX_BYTES. Returns the number of results removed.
+    """
+    store = get_job_store()
+    expired = store.expired_jobs(settings.RESULTS_TTL_SECONDS)
+    for clientUUID in expired:
+        delete_results(clientUUID)
+
+    over_budget = store.jobs_over_budget(settings.RESULTS_MAX_BYTES)
+    for clientUUID in over_budget:
+        delete_results(clientUUID)
+    return len(expired) + len(over_budget)
+
+
+def _sweep_forever():
+    logger = get_namespace_logger(NamespaceEnum.VALIDATE_DATASET)
+    while True:
+        time.sleep(settings.RESULTS_SWEEP_INTERVAL_SECONDS)
+        try:
+            removed = sweep_expired_results()
+        except Exception as e:
+            logger.error(f"Sweeping the validation results failed: {e}")
+            continue
+        if removed:
+            logger.info(f"Removed {removed} expired validation results")
+
+
+_sweeper = None
+
+
+def start_result_sweeper():
+    """
+    Start the background thread that removes expired results every RESULTS_SWEEP_INTERVAL_SECONDS.
+    """
+    global _sweeper
+    if _sweeper is None:
+        _sweeper = threading.Thread(target=_sweep_forever, name="result-sweeper", daemon=True)
+        _sweeper.start()
+    return _sweeper
+
+
+def encode_cursor(offset, results):
+    # the cursor is tied to the result it was issued for so it is not reused against a newer validation of the client
+    version = results.get("progress", {}).get("finished_at")
+    return base64.urlsafe_b64encode(json.dumps([offset, version]).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor, results):
+    """
+    Return the offset a cursor issued by encode_cursor points at.
+    """
+    try:
+        offset, version = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, TypeError, UnicodeError):
+        raise InvalidCursorError("The cursor is not valid")
+    if not isinstance(offset, int) or offset < 0:
+        raise InvalidCursorError("The cursor is not valid")
+    if version != results.get("progress", {}).get("finished_at"):
+        raise InvalidCursorError("The cursor belongs to an older result, start again without a cursor")
+    return offset
+
+
+def _matches_prefix(path, prefixes):
+    # a prefix matches whole path segments: #/meta matches #/meta and #/meta/... but not #/metadata
+    return any(path == prefix or path.startswith(prefix.rstrip("/") + "/") for prefix in prefixes)
+
+
+def filter_parsed_report(parsed_report, path_prefixes=None, message=None):
+    """
+    Return the ( path, error ) entries of parsed_report, in report order, under any of path_prefixes and with a message
+    containing message ( case insensitive ).
+    """
+    message = message.lower() if message else None
+    entries = []
+    for path, error in parsed_report.items():
+        if path_prefixes and not _matches_prefix(path, path_prefixes):
+            continue
+        if message is not None:
+            messages = error.get("messages", []) if isinstance(error, dict) else []
+            if not any(message in str(error_message).lower() for error_message in messages):
+                continue
+        entries.append((path, error))
+    return entries
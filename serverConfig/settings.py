@@ -0,0 +1,220 @@
+"""
+Runtime settings for the validation server. Every value can be overridden through an environment variable
+so deployments can be tuned without code changes.
+"""
+
+import os
+from os.path import expanduser
+
+
+def _int_setting(name, default):
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    return int(value)
+
+
+def _stage_seconds_setting(name):
+    # "stage=seconds" items separated by commas, e.g. "clean=300,validate=1800"
+    stage_seconds = {}
+    for item in os.getenv(name, "").split(","):
+        if not item.strip():
+            continue
+        stage, separator, seconds = item.partition("=")
+        try:
+            if not separator or not stage.strip():
+                raise ValueError
+            stage_seconds[stage.strip()] = int(seconds)
+        except ValueError:
+            raise ValueError(f"{name} must be a comma separated list of stage=seconds items, got {item.strip()!r}") from None
+    return stage_seconds
+
+
+def _executor_setting(name):
+    value = os.getenv(name, "thread").strip() or "thread"
+    if value != "thread":
+        raise ValueError(f"{name} only supports thread, got {value!r}: validation workers are daemonic processes and can not start a process pool")
+    return value
+
+
+### Storage ###
+
+# "disk" keeps everything under VALIDATOR_SODA_ROOT, "tmpfs" moves skeletons, results and job records to VALIDATOR_TMPFS_ROOT
+STORAGE_MODE = os.getenv("VALIDATOR_STORAGE_MODE", "disk")
+
+SODA_ROOT = os.getenv("VALIDATOR_SODA_ROOT", os.path.join(expanduser("~"), "SODA"))
+
+# RAM backed location used in tmpfs mode
+TMPFS_ROOT = os.getenv("VALIDATOR_TMPFS_ROOT", "/dev/shm/soda")
+
+# a job whose estimated skeleton size is larger than this is built on disk even in tmpfs mode
+TMPFS_BUDGET_BYTES = _int_setting("VALIDATOR_TMPFS_BUDGET_MB", 1024) * 1024 * 1024
+
+_volatile_root = TMPFS_ROOT if STORAGE_MODE == "tmpfs" else SODA_ROOT
+
+# skeleton datasets that do not fit the tmpfs budget ( or every skeleton in disk mode )
+SKELETON_ROOT = os.getenv("VALIDATOR_SKELETON_ROOT", os.path.join(SODA_ROOT, "skeleton"))
+TMPFS_SKELETON_ROOT = os.path.join(TMPFS_ROOT, "skeleton")
+
+RESULTS_ROOT = os.getenv("VALIDATOR_RESULTS_ROOT", os.path.join(_volatile_root, "results"))
+JOBS_ROOT = os.getenv("VALIDATOR_JOBS_ROOT", os.path.join(_volatile_root, "jobs"))
+COMPLETED_JOBS_ROOT = os.getenv("VALIDATOR_COMPLETED_JOBS_ROOT", os.path.join(SODA_ROOT, "completed_jobs"))
+SKELETON_STATE_ROOT = os.path.join(SODA_ROOT, "skeleton_state")
+CACHE_ROOT = os.getenv("VALIDATOR_CACHE_ROOT", os.path.join(SODA_ROOT, "cache"))
+# accepted requests wait here until a validation worker builds their skeleton
+SPOOL_ROOT = os.getenv("VALIDATOR_SPOOL_ROOT", os.path.join(SODA_ROOT, "spool"))
+
+
+### Validation Worker Pool ###
+
+# number of long-lived worker processes that have sparcur imported and are ready to take validation jobs
+WORKER_POOL_SIZE = _int_setting("VALIDATOR_WORKER_POOL_SIZE", 2)
+
+# minimum number of seconds between restarts of a crashed worker ( avoids a tight restart loop when a worker cannot start )
+WORKER_RESTART_DELAY_SECONDS = _int_setting("VALIDATOR_WORKER_RESTART_DELAY_SECONDS", 5)
+
+# a worker is replaced by a fresh process after this many jobs, or after a job that left it using more than WORKER_MAX_RSS_MB
+# of memory ( 0 disables either check )
+WORKER_MAX_JOBS = _int_setting("VALIDATOR_WORKER_MAX_JOBS", 50)
+WORKER_MAX_RSS_MB = _int_setting("VALIDATOR_WORKER_MAX_RSS_MB", 2048)
+
+### Job Resource Limits ###
+
+# limits every job runs under ( rlimits of the worker process, inherited by anything it starts ); 0 disables a limit.
+# A job that exceeds one finishes with a ResourceLimitExceeded status.
+JOB_MEMORY_LIMIT_MB = _int_setting("VALIDATOR_JOB_MEMORY_LIMIT_MB", 8192)
+JOB_CPU_LIMIT_SECONDS = _int_setting("VALIDATOR_JOB_CPU_LIMIT_SECONDS", 30 * 60)
+JOB_OPEN_FILES_LIMIT = _int_setting("VALIDATOR_JOB_OPEN_FILES_LIMIT", 4096)
+
+### Job Timeouts ###
+
+# a job still running this many seconds after a worker took it is stopped with a Timeout status ( 0 disables the limit )
+JOB_TIMEOUT_SECONDS = _int_setting("VALIDATOR_JOB_TIMEOUT_SECONDS", 60 * 60)
+
+# the same for the time a job spends in one pipeline stage, overridden per stage with e.g. "clean=300,validate=1800"
+STAGE_TIMEOUT_SECONDS = _int_setting("VALIDATOR_STAGE_TIMEOUT_SECONDS", 30 * 60)
+STAGE_TIMEOUTS = _stage_seconds_setting("VALIDATOR_STAGE_TIMEOUTS")
+
+### Admission Control ###
+
+# maximum number of validation jobs that run at the same time ( can not exceed the number of workers in the pool )
+MAX_CONCURRENT_JOBS = min(_int_setting("VALIDATOR_MAX_CONCURRENT_JOBS", WORKER_POOL_SIZE), WORKER_POOL_SIZE)
+
+# maximum number of validation jobs waiting for a worker; requests beyond this are rejected with a 503
+MAX_QUEUED_JOBS = _int_setting("VALIDATOR_MAX_QUEUED_JOBS", 20)
+
+# value of the Retry-After header sent to clients that are rejected because the queue is full
+QUEUE_FULL_RETRY_AFTER_SECONDS = _int_setting("VALIDATOR_QUEUE_FULL_RETRY_AFTER_SECONDS", 30)
+
+### Job Store ###
+
+# SQLite database ( WAL mode ) holding the status, progress and result location of every job, shared with the workers
+JOB_STORE_PATH = os.getenv("VALIDATOR_JOB_STORE_PATH", os.path.join(JOBS_ROOT, "jobs.sqlite3"))
+
+# how long a writer waits for another process holding the database lock before giving up
+JOB_STORE_BUSY_TIMEOUT_SECONDS = _int_setting("VALIDATOR_JOB_STORE_BUSY_TIMEOUT_SECONDS", 30)
+
+### Validation Results ###
+
+# finished results stay readable ( e.g. for paging through the parsed report ) for this long
+RESULTS_TTL_SECONDS = _int_setting("VALIDATOR_RESULTS_TTL_SECONDS", 60 * 60)
+
+# the background sweeper looks for expired results this often
+RESULTS_SWEEP_INTERVAL_SECONDS = _int_setting("VALIDATOR_RESULTS_SWEEP_INTERVAL_SECONDS", 5 * 60)
+
+# the oldest finished results ( results file and full report ) are removed once all of them take more than this many bytes
+RESULTS_MAX_BYTES = _int_setting("VALIDATOR_RESULTS_MAX_BYTES", 2 * 1024 * 1024 * 1024)
+
+# number of recently read results kept parsed in memory
+RESULTS_MEMORY_CACHE_ENTRIES = _int_setting("VALIDATOR_RESULTS_MEMORY_CACHE_ENTRIES", 8)
+
+# parsed report entries per page of /results/<clientUUID>/parsed_report
+PARSED_REPORT_PAGE_SIZE = _int_setting("VALIDATOR_PARSED_REPORT_PAGE_SIZE", 100)
+PARSED_REPORT_MAX_PAGE_SIZE = _int_setting("VALIDATOR_PARSED_REPORT_MAX_PAGE_SIZE", 1000)
+
+### Result Delivery ###
+
+# number of threads waitress serves requests with
+SERVER_THREADS = _int_setting("VALIDATOR_SERVER_THREADS", 16)
+
+# at most this many long-poll and event stream requests block at once ( each holds a server thread ), more get an immediate answer
+MAX_WAITING_CLIENTS = _int_setting("VALIDATOR_MAX_WAITING_CLIENTS", 8)
+
+# longest wait a client can ask for with /results/<clientUUID>?wait=<seconds>
+LONG_POLL_MAX_SECONDS = _int_setting("VALIDATOR_LONG_POLL_MAX_SECONDS", 60)
+
+# an event stream sends a comment this often so proxies do not close it, and is closed after SSE_MAX_SECONDS ( clients reconnect )
+SSE_HEARTBEAT_SECONDS = _int_setting("VALIDATOR_SSE_HEARTBEAT_SECONDS", 15)
+SSE_MAX_SECONDS = _int_setting("VALIDATOR_SSE_MAX_SECONDS", 30 * 60)
+
+### Validation Result Cache ###
+
+# set to 0 to always run the full validation pipeline
+RESULT_CACHE_ENABLED = _int_setting("VALIDATOR_RESULT_CACHE_ENABLED", 1) == 1
+
+# upper bound on the disk space used by cached results; least recently used entries are evicted first
+RESULT_CACHE_MAX_BYTES = _int_setting("VALIDATOR_RESULT_CACHE_MAX_MB", 512) * 1024 * 1024
+
+# cached results older than this are evicted even if there is room for them
+RESULT_CACHE_TTL_SECONDS = _int_setting("VALIDATOR_RESULT_CACHE_TTL_SECONDS", 24 * 60 * 60)
+
+### Skeleton Dataset ###
+
+# set to 1 to keep a client's skeleton between validations and only apply what changed in the next request
+INCREMENTAL_SKELETON = _int_setting("VALIDATOR_INCREMENTAL_SKELETON", 0) == 1
+
+# placeholder written into every skeleton data file: "content" writes the 4 byte body "SODA", "empty" creates zero length files
+SKELETON_PLACEHOLDER_MODE = os.getenv("VALIDATOR_SKELETON_PLACEHOLDER_MODE", "content")
+
+# number of threads creating skeleton placeholder files
+SKELETON_WRITER_THREADS = _int_setting("VALIDATOR_SKELETON_WRITER_THREADS", 4)
+
+### Request Ingestion ###
+
+# request bodies larger than this are parsed as a stream: the skeleton is built while the body is read and manifest/metadata
+# payloads are spooled to disk, so the whole document is never held in memory ( requires the optional ijson package )
+# NOTE: streamed skeletons are always built under VALIDATOR_SKELETON_ROOT since their size is not known up front
+STREAMING_THRESHOLD_BYTES = _int_setting("VALIDATOR_STREAMING_THRESHOLD_MB", 32) * 1024 * 1024
+
+### Guided Mode Metadata ###
+
+# keep parsed copies of the guided mode metadata templates in memory and clone them for every job
+TEMPLATE_CACHE_ENABLED = _int_setting("VALIDATOR_TEMPLATE_CACHE_ENABLED", 1) == 1
+
+# guided mode metadata files are written concurrently by this many threads; only threads are supported since the files are
+# written inside the daemonic validation workers, which can not start a process pool
+GUIDED_METADATA_WORKERS = _int_setting("VALIDATOR_GUIDED_METADATA_WORKERS", 4)
+GUIDED_METADATA_EXECUTOR = _executor_setting("VALIDATOR_GUIDED_METADATA_EXECUTOR")
+
+### Manifests ###
+
+# format of the manifest written to every high level folder of a skeleton, xlsx or csv ( both are read by sparcur )
+MANIFEST_FORMAT = os.getenv("VALIDATOR_MANIFEST_FORMAT", "xlsx")
+
+### Compression ###
+
+# a gzip/zstd compressed request body that inflates beyond this is rejected with a 413 ( guards against zip bombs )
+MAX_DECOMPRESSED_BODY_BYTES = _int_setting("VALIDATOR_MAX_DECOMPRESSED_BODY_MB", 1024) * 1024 * 1024
+
+# results responses smaller than this are sent uncompressed
+COMPRESS_MIN_BYTES = _int_setting("VALIDATOR_COMPRESS_MIN_BYTES", 1024)
+
+# how much bigger than its compressed size a JSON request body is assumed to be when deciding whether to stream it
+ESTIMATED_COMPRESSION_RATIO = 10
+
+GZIP_COMPRESSION_LEVEL = _int_setting("VALIDATOR_GZIP_COMPRESSION_LEVEL", 6)
+ZSTD_COMPRESSION_LEVEL = _int_setting("VALIDATOR_ZSTD_COMPRESSION_LEVEL", 3)
+
+### Error Reports ###
+
+# error paths with any of these segments are left out of the parsed report ( as per Tom the #/inputs paths are not shown )
+ERROR_REPORT_PATH_FILTERS = [segment for segment in os.getenv("VALIDATOR_ERROR_REPORT_PATH_FILTERS", "inputs").split(",") if segment]
+
+# set to 0 to leave the grouped error summary out of validation results
+ERROR_SUMMARY_ENABLED = _int_setting("VALIDATOR_ERROR_SUMMARY_ENABLED", 1) == 1
+
+# number of concrete error paths kept for every group of the error summary
+ERROR_SUMMARY_SAMPLE_PATHS = _int_setting("VALIDATOR_ERROR_SUMMARY_SAMPLE_PATHS", 5)
+
+# view returned by /results when the client does not ask for one: "full" ( every parsed error ) or "summary"
+RESULTS_DEFAULT_VIEW = os.getenv("VALIDATOR_RESULTS_DEFAULT_VIEW", "full")
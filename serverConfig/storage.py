@@ -0,0 +1,64 @@
+"""
+Where the validation server keeps its files. Skeletons can live on a RAM backed tmpfs ( see STORAGE_MODE ) and fall back to
+disk for jobs too large for the tmpfs budget, so code looking for a client's skeleton must go through skeleton_path.
+"""
+
+import os
+import shutil
+
+from . import settings
+
+
+def skeleton_roots():
+    """
+    Every directory a skeleton dataset can be built in, preferred first.
+    """
+    if settings.STORAGE_MODE == "tmpfs":
+        return [settings.TMPFS_SKELETON_ROOT, settings.SKELETON_ROOT]
+    return [settings.SKELETON_ROOT]
+
+
+def skeleton_path(clientUUID):
+    """
+    Return the path of the client's existing skeleton, or where it would be on disk when there is none.
+    """
+    for root in skeleton_roots():
+        path = os.path.join(root, clientUUID)
+        if os.path.exists(path):
+            return path
+    return os.path.join(settings.SKELETON_ROOT, clientUUID)
+
+
+def choose_skeleton_root(estimated_bytes):
+    """
+    Pick the root a new skeleton of roughly estimated_bytes is built in: the tmpfs when in tmpfs mode, the job fits the budget
+    and the tmpfs has room for it, disk otherwise.
+    """
+    if settings.STORAGE_MODE != "tmpfs" or estimated_bytes > settings.TMPFS_BUDGET_BYTES:
+        return settings.SKELETON_ROOT
+
+    try:
+        os.makedirs(settings.TMPFS_SKELETON_ROOT, exist_ok=True)
+        free_bytes = shutil.disk_usage(settings.TMPFS_SKELETON_ROOT).free
+    except OSError:
+        return settings.SKELETON_ROOT
+
+    if estimated_bytes > free_bytes:
+        return settings.SKELETON_ROOT
+    return settings.TMPFS_SKELETON_ROOT
+
+
+def spool_file(clientUUID):
+    return os.path.join(settings.SPOOL_ROOT, f"{clientUUID}.json")
+
+
+def results_file(clientUUID):
+    return os.path.join(settings.RESULTS_ROOT, f"{clientUUID}.json")
+
+
+# file extension of the stored full report by compression
+FULL_REPORT_ENCODINGS = {"zstd": "zst", "gzip": "gz"}
+
+
+def full_report_file(clientUUID, encoding):
+    return os.path.join(settings.RESULTS_ROOT, f"{clientUUID}.full_report.json.{FULL_REPORT_ENCODINGS[encoding]}")
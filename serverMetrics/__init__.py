@@ -0,0 +1,2 @@
+from .metricsRegistry import MetricsRegistry, Counter, Histogram, CallbackMetric
+from .pipelineMetrics import REGISTRY, observe_request, observe_finished_job, render_metrics, start_skeleton_usage_refresher
@@ -0,0 +1,125 @@
+"""
+A small registry of metrics rendered in the Prometheus text exposition format. Every metric lives in the server process:
+work done by the validation workers is observed there once the job finishes ( from the job store ), so the numbers of all
+worker processes add up without a multiprocess metrics backend.
+"""
+
+import math
+import threading
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for value in labels.values())
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + "}"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, description, label_names=()):
+        self.name = name
+        self.description = description
+        self.label_names = list(label_names)
+        self._lock = threading.Lock()
+        # label values tuple -> value ( or histogram state )
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} takes the labels {self.label_names}, got {list(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self):
+        """
+        Return ( name, labels, value ) of every sample of the metric.
+        """
+        with self._lock:
+            return [(self.name, dict(zip(self.label_names, key)), value) for key, value in self._values.items()]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, description, label_names=(), buckets=()):
+        super().__init__(name, description, label_names)
+        self.buckets = sorted(buckets) + [math.inf]
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, (counts, total) in self._values.items():
+                labels = dict(zip(self.label_names, key))
+                for bound, count in zip(self.buckets, counts):
+                    samples.append((f"{self.name}_bucket", {**labels, "le": _format_value(float(bound))}, count))
+                samples.append((f"{self.name}_sum", labels, total))
+                samples.append((f"{self.name}_count", labels, counts[-1]))
+        return samples
+
+
+class CallbackMetric(_Metric):
+    """
+    A gauge or counter whose samples are read when the metrics are rendered. callback returns ( labels, value ) pairs.
+    """
+
+    def __init__(self, name, description, kind, callback):
+        super().__init__(name, description)
+        self.kind = kind
+        self.callback = callback
+
+    def samples(self):
+        try:
+            return [(self.name, labels, value) for labels, value in self.callback()]
+        except Exception:
+            # a source that can not be read right now ( e.g. a locked job store ) must not take the other metrics down
+            return []
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """
+        Return every metric in the Prometheus text exposition format ( version 0.0.4 ).
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.header())
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,161 @@
+"""
+The metrics of the validation server: HTTP requests, the job queue, the stages of every validation job, result sizes,
+the result cache and the disk used by skeleton datasets.
+"""
+
+import os
+import threading
+
+from jobStore import get_job_store
+from namespaces import NamespaceEnum, get_namespace_logger
+from serverConfig import storage
+from .metricsRegistry import MetricsRegistry, Counter, Histogram, CallbackMetric
+
+
+# skeleton trees can hold many files, their disk usage is measured in the background this often
+SKELETON_USAGE_REFRESH_SECONDS = 30
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    "validator_http_requests_total", "HTTP requests by route and status code", ["method", "route", "status"],
+))
+HTTP_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "validator_http_request_duration_seconds", "Time spent answering HTTP requests", ["method", "route"],
+    buckets=[0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60],
+))
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "validator_stage_duration_seconds", "Duration of the stages of finished validation jobs", ["stage"],
+    buckets=[0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600],
+))
+JOBS_FINISHED = REGISTRY.register(Counter(
+    "validator_jobs_finished_total", "Finished validation jobs by status", ["status"],
+))
+RESULT_BYTES = REGISTRY.register(Histogram(
+    "validator_result_size_bytes", "Size of the stored results ( results file and compressed full report ) of finished jobs", ["kind"],
+    buckets=[1024 * 4 ** exponent for exponent in range(11)],
+))
+
+
+def _pool_samples(field):
+    from workerPool import running_worker_pool
+
+    # a scrape must not start the workers, a pool that is not running has no jobs or ready workers
+    pool = running_worker_pool()
+    return [({}, pool.stats()[field] if pool is not None else 0)]
+
+
+def _cache_samples(field):
+    from resultCache import get_result_cache
+
+    cache = get_result_cache()
+    return [({}, cache.stats()[field])] if cache is not None else []
+
+
+# the last measured ( bytes, files ) of every skeleton root, written by the refresher thread and only read by scrapes
+_skeleton_usage = {}
+_skeleton_usage_refresh = threading.Event()
+_skeleton_usage_refresher = None
+
+
+def _directory_usage(path):
+    # ( bytes allocated on disk, number of files ) below path, walked without recursion since skeletons can be deep
+    used_bytes, files = 0, 0
+    directories = [path]
+    while directories:
+        try:
+            entries = list(os.scandir(directories.pop()))
+        except OSError:
+            continue
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    directories.append(entry.path)
+                else:
+                    stat = entry.stat(follow_symlinks=False)
+                    used_bytes += getattr(stat, "st_blocks", 0) * 512 or stat.st_size
+                    files += 1
+            except OSError:
+                continue
+    return used_bytes, files
+
+
+def _refresh_skeleton_usage_forever():
+    logger = get_namespace_logger(NamespaceEnum.VALIDATE_DATASET)
+    while True:
+        try:
+            for root in storage.skeleton_roots():
+                _skeleton_usage[root] = _directory_usage(root)
+        except Exception as e:
+            logger.error(f"Measuring the disk usage of the skeleton datasets failed: {e}")
+        # finished jobs create and remove skeletons, they wake the refresher up early
+        _skeleton_usage_refresh.wait(SKELETON_USAGE_REFRESH_SECONDS)
+        _skeleton_usage_refresh.clear()
+
+
+def start_skeleton_usage_refresher():
+    """
+    Start the background thread that measures the disk usage of the skeleton datasets every SKELETON_USAGE_REFRESH_SECONDS
+    and after every finished job. Until it has measured a root the root is left out of the metrics.
+    """
+    global _skeleton_usage_refresher
+    if _skeleton_usage_refresher is None:
+        _skeleton_usage_refresher = threading.Thread(target=_refresh_skeleton_usage_forever, name="skeleton-usage-refresher", daemon=True)
+        _skeleton_usage_refresher.start()
+    return _skeleton_usage_refresher
+
+
+def _skeleton_usage_samples(index):
+    return [({"root": root}, usage[index]) for root, usage in list(_skeleton_usage.items())]
+
+
+for name, description, field in [
+    ("validator_queued_jobs", "Validation jobs waiting for a worker ( including requests still being submitted )", "queued"),
+    ("validator_running_jobs", "Validation jobs running on a worker", "running"),
+    ("validator_ready_workers", "Validation workers that are started and ready for jobs", "ready_workers"),
+]:
+    REGISTRY.register(CallbackMetric(name, description, "gauge", lambda field=field: _pool_samples(field)))
+
+for name, description, kind, field in [
+    ("validator_result_cache_hits_total", "Lookups answered by the result cache", "counter", "hits"),
+    ("validator_result_cache_misses_total", "Lookups the result cache could not answer", "counter", "misses"),
+    ("validator_result_cache_evictions_total", "Results evicted from the result cache", "counter", "evictions"),
+    ("validator_result_cache_bytes", "Bytes held by the result cache", "gauge", "bytes"),
+]:
+    REGISTRY.register(CallbackMetric(name, description, kind, lambda field=field: _cache_samples(field)))
+
+REGISTRY.register(CallbackMetric(
+    "validator_skeleton_disk_usage_bytes", "Disk space used by skeleton datasets by skeleton root", "gauge", lambda: _skeleton_usage_samples(0),
+))
+REGISTRY.register(CallbackMetric(
+    "validator_skeleton_files", "Files in skeleton datasets by skeleton root", "gauge", lambda: _skeleton_usage_samples(1),
+))
+
+
+def observe_request(method, route, status, seconds):
+    HTTP_REQUESTS.inc(method=method, route=route, status=status)
+    HTTP_REQUEST_SECONDS.observe(seconds, method=method, route=route)
+
+
+def observe_finished_job(clientUUID):
+    """
+    Record the outcome, stage durations and result sizes of the client's finished job, read from the job store.
+    """
+    _skeleton_usage_refresh.set()
+
+    job = get_job_store().get_job(clientUUID)
+    if job is None or job["finished_at"] is None:
+        return
+
+    JOBS_FINISHED.inc(status=job["status"])
+    for stage, timing in job["progress"].get("stages", {}).items():
+        if timing.get("duration_seconds") is not None:
+            STAGE_SECONDS.observe(timing["duration_seconds"], stage=stage)
+
+    RESULT_BYTES.observe(job["results_bytes"], kind="results")
+    if job["full_report_bytes"]:
+        RESULT_BYTES.observe(job["full_report_bytes"], kind="full_report")
+
+
+def render_metrics():
+    return REGISTRY.render()
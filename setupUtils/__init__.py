@@ -1,3 +1,5 @@
 from .configureAPI import configureAPI
 from .configureLogger import configureLogger
 from .configureRouteHandlers import configureRouteHandlers
+from .configureCompression import configureCompression
+from .configureMetrics import configureMetrics
@@ -0,0 +1,174 @@
+import gzip
+import zlib
+from flask import request
+from werkzeug.exceptions import BadRequest, RequestEntityTooLarge, UnsupportedMediaType
+from serverConfig import settings
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# routes whose responses are compressed when the client accepts it
+COMPRESSED_ROUTE_PREFIXES = ["/validator/results"]
+
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def supported_encodings():
+    return ["zstd", "gzip"] if zstandard is not None else ["gzip"]
+
+
+class DecompressedInput:
+    """
+    File like view of a compressed request body that inflates it as it is read and refuses to inflate past max_bytes.
+    """
+
+    def __init__(self, reader, max_bytes):
+        self.reader = reader
+        self.max_bytes = max_bytes
+        self.bytes_read = 0
+        # inflated bytes readline looked at but did not return yet
+        self._buffer = bytearray()
+
+    def _inflate(self, size):
+        try:
+            # read at most one byte past the limit so an oversized body is detected without inflating more of it
+            chunk = self.reader.read(min(size, self.max_bytes - self.bytes_read + 1))
+        except (OSError, EOFError, zlib.error) as e:
+            raise BadRequest(f"The request body could not be decompressed: {e}")
+        except Exception as e:
+            if zstandard is not None and isinstance(e, zstandard.ZstdError):
+                raise BadRequest(f"The request body could not be decompressed: {e}")
+            raise
+
+        self.bytes_read += len(chunk)
+        if self.bytes_read > self.max_bytes:
+            raise RequestEntityTooLarge(f"The decompressed request body is larger than {self.max_bytes} bytes")
+        return chunk
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            return b"".join(iter(lambda: self.read(READ_CHUNK_SIZE), b""))
+
+        if self._buffer:
+            chunk = bytes(self._buffer[:size])
+            del self._buffer[:size]
+            return chunk
+        return self._inflate(size)
+
+    def readline(self, size=-1):
+        limited = size is not None and size >= 0
+        while b"\n" not in self._buffer and not (limited and len(self._buffer) >= size):
+            chunk = self._inflate(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            self._buffer += chunk
+
+        end = self._buffer.find(b"\n") + 1 or len(self._buffer)
+        if limited:
+            end = min(end, size)
+        line = bytes(self._buffer[:end])
+        del self._buffer[:end]
+        return line
+
+    def readlines(self, hint=-1):
+        lines = []
+        total_bytes = 0
+        for line in self:
+            lines.append(line)
+            total_bytes += len(line)
+            if hint is not None and 0 < hint <= total_bytes:
+                break
+        return lines
+
+    def __iter__(self):
+        return iter(self.readline, b"")
+
+
+class DecompressionMiddleware:
+    """
+    WSGI middleware that transparently inflates request bodies sent with Content-Encoding gzip or zstd.
+    """
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        encoding = environ.get("HTTP_CONTENT_ENCODING", "identity").strip().lower()
+        if encoding in ("", "identity"):
+            return self.wsgi_app(environ, start_response)
+
+        if encoding not in supported_encodings():
+            return UnsupportedMediaType(f"Unsupported Content-Encoding: {encoding}")(environ, start_response)
+
+        stream = environ["wsgi.input"]
+        content_length = environ.get("CONTENT_LENGTH")
+        if content_length:
+            # never read past the end of this request's body on a kept alive connection
+            stream = _LimitedInput(stream, int(content_length))
+
+        if encoding == "gzip":
+            reader = gzip.GzipFile(fileobj=stream, mode="rb")
+        else:
+            reader = zstandard.ZstdDecompressor().stream_reader(stream)
+
+        environ["wsgi.input"] = DecompressedInput(reader, settings.MAX_DECOMPRESSED_BODY_BYTES)
+        # the decompressed length is unknown so the body is read until the decompressor runs dry
+        environ["validator.compressed_content_length"] = int(content_length or 0)
+        environ.pop("CONTENT_LENGTH", None)
+        environ.pop("HTTP_CONTENT_ENCODING", None)
+        environ["wsgi.input_terminated"] = True
+        return self.wsgi_app(environ, start_response)
+
+
+class _LimitedInput:
+    def __init__(self, stream, remaining):
+        self.stream = stream
+        self.remaining = remaining
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        if size == 0:
+            return b""
+        chunk = self.stream.read(size)
+        self.remaining -= len(chunk)
+        return chunk
+
+
+def compress_response(response):
+    """
+    after_request hook compressing results responses for clients that send a matching Accept-Encoding.
+    """
+    if not any(request.path.startswith(prefix) for prefix in COMPRESSED_ROUTE_PREFIXES):
+        return response
+    if response.status_code != 200 or response.is_streamed or response.direct_passthrough or "Content-Encoding" in response.headers:
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = request.accept_encodings.best_match(supported_encodings())
+    if encoding is None:
+        return response
+
+    body = response.get_data()
+    if len(body) < settings.COMPRESS_MIN_BYTES:
+        return response
+
+    if encoding == "zstd":
+        body = zstandard.ZstdCompressor(level=settings.ZSTD_COMPRESSION_LEVEL).compress(body)
+    else:
+        body = gzip.compress(body, compresslevel=settings.GZIP_COMPRESSION_LEVEL)
+
+    response.set_data(body)
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def configureCompression(app):
+    """
+    Accept gzip/zstd compressed request bodies and compress results responses.
+    """
+    app.wsgi_app = DecompressionMiddleware(app.wsgi_app)
+    app.after_request(compress_response)
@@ -0,0 +1,28 @@
+import time
+from flask import g, request, Response
+from serverMetrics import observe_request, render_metrics
+
+
+def _start_timer():
+    g.metrics_started_at = time.perf_counter()
+
+
+def _observe_response(response):
+    started_at = g.pop("metrics_started_at", None)
+    if started_at is not None:
+        # the route template ( e.g. /validator/results/<string:clientUUID> ) so every client shares the same series
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        observe_request(request.method, route, response.status_code, time.perf_counter() - started_at)
+    return response
+
+
+def configureMetrics(app):
+    """
+    Count and time every request and expose the server's metrics in the Prometheus text format at /metrics.
+    """
+    app.before_request(_start_timer)
+    app.after_request(_observe_response)
+
+    @app.route("/metrics")
+    def metrics():
+        return Response(render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
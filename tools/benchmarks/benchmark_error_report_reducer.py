@@ -0,0 +1,82 @@
+"""
+Compare the trie based error_path_report reducer with the original deepcopy based parse() on synthetic reports.
+
+Usage ( from the repository root ):
+    python tools/benchmarks/benchmark_error_report_reducer.py --paths 50000
+"""
+
+import copy
+import os
+import sys
+import time
+from argparse import ArgumentParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from errorReport import reduce_error_path_report
+
+
+def legacy_get_path_prefix(path):
+    if path.count('/') == 1:
+        return path
+    return path[:path.rfind("/") + 1]
+
+
+def legacy_parse(error_path_report):
+    # the implementation validate.py used before the reducer
+    user_errors = copy.deepcopy(error_path_report)
+    for k in error_path_report.keys():
+        prefix = legacy_get_path_prefix(k)
+        if prefix.find("inputs") != -1:
+            del user_errors[k]
+            continue
+        if prefix[-1] == "/":
+            prefix_no_suffix_indicator = prefix[0:len(prefix) - 1]
+            if prefix_no_suffix_indicator in user_errors:
+                del user_errors[prefix_no_suffix_indicator]
+    return user_errors
+
+
+def synthetic_report(path_count):
+    """
+    Build a report shaped like sparcur's: every error path is also reported for each of its parents.
+    """
+    report = {}
+    index = 0
+    while len(report) < path_count:
+        base = f"#/{'inputs' if index % 10 == 0 else 'meta'}/manifest_file/{index}/contents/{index % 7}"
+        segments = base.split("/")
+        for depth in range(2, len(segments) + 1):
+            path = "/".join(segments[:depth])
+            report.setdefault(path, {
+                "error_count": 1,
+                "messages": [f"{path} is not valid under any of the given schemas", "'path_metadata' is a required property"],
+                "schema_path": ["properties", "contents", "items", "anyOf", index % 3],
+            })
+        index += 1
+    return report
+
+
+def time_run(reduce, report, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = reduce(report)
+        timings.append(time.perf_counter() - start)
+    return timings, result
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--paths", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    report = synthetic_report(args.paths)
+
+    results = {}
+    for name, reduce in [("legacy deepcopy parse", legacy_parse), ("trie reducer", reduce_error_path_report)]:
+        timings, results[name] = time_run(reduce, report, args.repeat)
+        print(f"{name:<24} best {min(timings):.3f}s  mean {sum(timings) / len(timings):.3f}s  ( {len(report)} paths, {len(results[name])} kept )")
+
+    print("same paths kept:", list(results["legacy deepcopy parse"]) == list(results["trie reducer"]))
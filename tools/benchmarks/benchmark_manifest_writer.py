@@ -0,0 +1,96 @@
+"""
+Compare the manifest writer with the original pandas DataFrame -> to_excel path on synthetic manifests, and writing the
+folders one after another ( what write_manifests does ) with fanning them out over --workers threads or processes.
+
+Usage ( from the repository root ):
+    python tools/benchmarks/benchmark_manifest_writer.py --folders 4 --rows 20000 --workers 4
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from namespaces import configure_namespaces
+configure_namespaces()
+
+import pandas as pd
+
+from validator.manifestWriter import write_manifest, write_manifests
+
+
+def legacy_create_manifests(manifest_struct, path):
+    # the pandas implementation the manifest writer replaced
+    for key in manifest_struct:
+        manifest_df = pd.DataFrame(json.loads(manifest_struct[key]))
+        manifest_df.to_excel(f"{path}/{key}/manifest.xlsx", index=False)
+
+
+def _write_manifest_job(job):
+    # module level so a process pool can pickle it
+    return write_manifest(*job)
+
+
+def fanned_out(executor_class, max_workers):
+    # write the folders' manifests concurrently, the alternative write_manifests does not take
+    def create(manifest_struct, path):
+        jobs = [(manifest_struct[key], os.path.join(path, key)) for key in manifest_struct]
+        with executor_class(max_workers=max_workers) as executor:
+            return list(executor.map(_write_manifest_job, jobs))
+    return create
+
+
+def synthetic_manifests(folder_count, row_count):
+    """
+    Build folder name -> manifest JSON in the column -> {row index -> value} layout the client sends.
+    """
+    manifests = {}
+    for folder_index in range(folder_count):
+        manifest = {
+            "filename": {str(i): f"sub-{i % 50}/sam-{i}/file-{i}.dat" for i in range(row_count)},
+            "timestamp": {str(i): "2023-01-01T00:00:00Z" for i in range(row_count)},
+            "description": {str(i): f"Recording {i} of folder {folder_index}" for i in range(row_count)},
+            "file type": {str(i): ".dat" for i in range(row_count)},
+            "Additional Metadata": {str(i): None for i in range(row_count)},
+        }
+        manifests[f"folder-{folder_index}"] = json.dumps(manifest)
+    return manifests
+
+
+def time_run(create, manifests):
+    path = tempfile.mkdtemp(prefix="manifest-benchmark-")
+    try:
+        for key in manifests:
+            os.mkdir(os.path.join(path, key))
+        start = time.perf_counter()
+        create(manifests, path)
+        return time.perf_counter() - start
+    finally:
+        shutil.rmtree(path)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--folders", type=int, default=4)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    manifests = synthetic_manifests(args.folders, args.rows)
+
+    runs = [
+        ("legacy pandas to_excel", legacy_create_manifests),
+        ("write_manifests 1 worker", write_manifests),
+        (f"{args.workers} threads", fanned_out(ThreadPoolExecutor, args.workers)),
+        (f"{args.workers} processes", fanned_out(ProcessPoolExecutor, args.workers)),
+    ]
+    for name, create in runs:
+        timings = [time_run(create, manifests) for _ in range(args.repeat)]
+        print(f"{name:<28} best {min(timings):.3f}s  mean {sum(timings) / len(timings):.3f}s  ( {args.folders} x {args.rows} rows )")
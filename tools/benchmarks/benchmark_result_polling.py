@@ -0,0 +1,103 @@
+"""
+Measure how many result polls per second validation servers answer for a job that is still in progress, before and after
+WIP polls were answered from the in-memory revision index:
+    before             plain polls against a server running the code from before the index ( --baseline-url )
+    plain polls        plain polls against the current server, every poll still reads the job store
+    conditional polls  polls with If-None-Match against the current server, answered with a 304 from memory
+
+Usage ( from the repository root, with both servers running on the same host and sharing the job store ):
+    git worktree add /tmp/polling-baseline eaaeb1a~1
+    ( cd /tmp/polling-baseline && waitress-serve --listen 127.0.0.1:4001 app:app ) &
+    python app.py &
+    python tools/benchmarks/benchmark_result_polling.py --url http://127.0.0.1:4000 --baseline-url http://127.0.0.1:4001
+
+A WIP job is registered directly in the servers' job store ( see VALIDATOR_JOB_STORE_PATH ) and removed afterwards. Any
+failed poll is reported and the tool exits with a non-zero status instead of printing a rate.
+"""
+
+import http.client
+import os
+import sys
+import threading
+import time
+import uuid
+from argparse import ArgumentParser
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from jobProgress import JobRecord, delete_job_record
+
+
+def poll(url, path, conditional, deadline, counts, errors, index):
+    try:
+        counts[index] = poll_until(url, path, conditional, deadline)
+    except Exception as e:
+        errors.append(f"{url.geturl()}{path}: {e!r}")
+
+
+def poll_until(url, path, conditional, deadline):
+    connection = http.client.HTTPConnection(url.hostname, url.port or 80)
+    etag = None
+    polls = 0
+    while time.monotonic() < deadline:
+        headers = {"If-None-Match": etag} if conditional and etag else {}
+        connection.request("GET", path, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        if response.status not in (200, 304):
+            raise RuntimeError(f"Unexpected status {response.status} for {path}")
+        etag = response.getheader("ETag", etag)
+        polls += 1
+    connection.close()
+    return polls
+
+
+def run(url, clientUUID, conditional, clients, seconds):
+    """
+    Return the polls per second clients answered over seconds, or None after printing why a poll failed.
+    """
+    path = f"{url.path.rstrip('/')}/validator/results/{clientUUID}"
+    counts = [0] * clients
+    errors = []
+    deadline = time.monotonic() + seconds
+    threads = [threading.Thread(target=poll, args=(url, path, conditional, deadline, counts, errors, index)) for index in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for error in errors:
+        print(f"poll failed: {error}", file=sys.stderr)
+    return sum(counts) / seconds if not errors else None
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:4000")
+    parser.add_argument("--baseline-url", help="a server running the code from before the revision index")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    runs = [("plain polls", args.url, False), ("conditional polls", args.url, True)]
+    if args.baseline_url:
+        runs.insert(0, ("before", args.baseline_url, False))
+    else:
+        print("no --baseline-url given, only the current server is measured", file=sys.stderr)
+
+    clientUUID = f"polling-benchmark-{uuid.uuid4()}"
+    job_record = JobRecord(clientUUID)
+    job_record.register()
+    job_record.mark_queued()
+    failed = False
+    try:
+        for name, url, conditional in runs:
+            rate = run(urlparse(url), clientUUID, conditional, args.clients, args.seconds)
+            if rate is None:
+                failed = True
+                print(f"{name:<20}   failed")
+            else:
+                print(f"{name:<20} {rate:8.0f} polls/s  ( {args.clients} clients, {args.seconds:.0f}s )")
+    finally:
+        delete_job_record(clientUUID)
+    sys.exit(1 if failed else 0)
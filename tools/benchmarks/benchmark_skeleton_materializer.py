@@ -0,0 +1,75 @@
+"""
+Compare the skeleton materializer with the original recursive create_skeleton on synthetic dataset trees.
+
+Usage ( from the repository root ):
+    python tools/benchmarks/benchmark_skeleton_materializer.py --files 100000 --files-per-folder 500
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from namespaces import configure_namespaces
+configure_namespaces()
+
+from validator.skeletonMaterializer import materialize_skeleton
+
+
+def legacy_create_skeleton(dataset_structure, path):
+    # the recursive implementation the materializer replaced
+    for folder in dataset_structure["folders"]:
+        dp = (os.path.join(path, folder))
+        if not os.path.exists(dp):
+            os.mkdir(dp)
+
+        legacy_create_skeleton(dataset_structure["folders"][folder], os.path.join(path, folder))
+    if "files" in dataset_structure:
+        for file_key in dataset_structure["files"]:
+            with open(os.path.join(path, file_key), "w") as f:
+                f.write("SODA")
+
+
+def synthetic_dataset_structure(file_count, files_per_folder, depth):
+    """
+    Build a dataset-structure with file_count files spread over folders nested depth levels deep.
+    """
+    root = {"folders": {}, "files": {}}
+    folder_count = max(1, file_count // files_per_folder)
+    for folder_index in range(folder_count):
+        folder = root
+        for level in range(depth):
+            name = f"folder-{folder_index}" if level == depth - 1 else f"level-{level}-{folder_index % (level + 2)}"
+            folder = folder["folders"].setdefault(name, {"folders": {}, "files": {}})
+        for file_index in range(files_per_folder):
+            folder["files"][f"file-{file_index}.dat"] = {"type": "local"}
+    return root
+
+
+def time_run(create, dataset_structure):
+    path = tempfile.mkdtemp(prefix="skeleton-benchmark-")
+    try:
+        start = time.perf_counter()
+        create(dataset_structure, path)
+        return time.perf_counter() - start
+    finally:
+        shutil.rmtree(path)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--files", type=int, default=100000)
+    parser.add_argument("--files-per-folder", type=int, default=500)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    dataset_structure = synthetic_dataset_structure(args.files, args.files_per_folder, args.depth)
+
+    for name, create in [("legacy create_skeleton", legacy_create_skeleton), ("materialize_skeleton", materialize_skeleton)]:
+        timings = [time_run(create, dataset_structure) for _ in range(args.repeat)]
+        print(f"{name:<24} best {min(timings):.3f}s  mean {sum(timings) / len(timings):.3f}s  ( {args.files} files )")
@@ -0,0 +1,112 @@
+"""
+Compare the bulk table writer used by save_subjects_file with the original per-cell writer on synthetic subjects tables.
+
+Usage ( from the repository root ):
+    python tools/benchmarks/benchmark_subjects_writer.py --rows 10000 --custom-columns 5
+
+The subjects.xlsx template is read from ~/file_templates. Without it a stand-in template holding only the header row is used.
+"""
+
+import itertools
+import os
+import shutil
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from string import ascii_uppercase
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from namespaces import configure_namespaces
+configure_namespaces()
+
+from openpyxl import Workbook, load_workbook
+from openpyxl.styles import Font, PatternFill
+
+from validator import validator
+
+
+def legacy_excel_columns(start_index=0):
+    single_letter = list(ascii_uppercase[start_index:])
+    two_letter = [a + b for a, b in itertools.product(ascii_uppercase, ascii_uppercase)]
+    return single_letter + two_letter
+
+
+def legacy_write_metadata_table(ws1, refinedDatastructure, template_columns):
+    # the per-cell loops save_subjects_file used before the bulk table writer
+    headers_no = len(refinedDatastructure[0])
+    orangeFill = PatternFill(start_color="FFD965", end_color="FFD965", fill_type="solid")
+    for column, header in zip(legacy_excel_columns(start_index=template_columns), refinedDatastructure[0][template_columns:headers_no]):
+        cell = column + str(1)
+        ws1[cell] = header
+        ws1[cell].fill = orangeFill
+        ws1[cell].font = Font(bold=True, size=12, name="Calibri")
+
+    for i, item in enumerate(refinedDatastructure):
+        if i == 0:
+            continue
+        for column, j in zip(legacy_excel_columns(start_index=0), range(len(item))):
+            cell = column + str(i + 1)
+            ws1[cell] = refinedDatastructure[i][j] or ""
+            ws1[cell].font = Font(bold=False, size=11, name="Arial")
+
+
+def synthetic_subjects_table(row_count, custom_column_count):
+    header = [*validator.subjectsTemplateHeaderList, *(f"custom field {i}" for i in range(custom_column_count))]
+    rows = [[f"{field}-{i}" for field in header] for i in range(row_count)]
+    return [header, *rows]
+
+
+def ensure_template(template_dir):
+    if os.path.isfile(os.path.join(validator.TEMPLATE_PATH, "subjects.xlsx")):
+        return
+    workbook = Workbook()
+    worksheet = workbook.active
+    worksheet.title = "Sheet1"
+    worksheet.append(validator.subjectsTemplateHeaderList)
+    workbook.save(os.path.join(template_dir, "subjects.xlsx"))
+    validator.TEMPLATE_PATH = template_dir
+
+
+def time_run(write_table, table, work_dir):
+    destination = os.path.join(work_dir, "output.xlsx")
+    current = validator.write_metadata_table
+    validator.write_metadata_table = write_table
+    try:
+        start = time.perf_counter()
+        validator.save_subjects_file(destination, table)
+        return time.perf_counter() - start, destination
+    finally:
+        validator.write_metadata_table = current
+
+
+def read_values(destination):
+    workbook = load_workbook(destination)
+    return [[(cell.value, cell.font.name, cell.font.b, cell.fill.fgColor.rgb) for cell in row] for row in workbook["Sheet1"].iter_rows()]
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--custom-columns", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="subjects-benchmark-")
+    try:
+        ensure_template(work_dir)
+        table = synthetic_subjects_table(args.rows, args.custom_columns)
+
+        outputs = {}
+        for name, write_table in [("legacy per-cell writer", legacy_write_metadata_table), ("bulk table writer", validator.write_metadata_table)]:
+            timings = []
+            for _ in range(args.repeat):
+                elapsed, destination = time_run(write_table, table, work_dir)
+                timings.append(elapsed)
+            outputs[name] = read_values(destination)
+            print(f"{name:<24} best {min(timings):.3f}s  mean {sum(timings) / len(timings):.3f}s  ( {args.rows} rows )")
+
+        print("identical output:", len(set(map(repr, outputs.values()))) == 1)
+    finally:
+        shutil.rmtree(work_dir)
@@ -4,80 +4,30 @@ from pathlib import Path
 from sparcur.paths import Path as SparCurPath
 from sparcur.simple.validate import main as validate
 from sparcur.simple.clean_metadata_files import main as clean_metadata_files
-import shutil
 import json 
-import copy
 import sys
+from jobProgress import JobRecord
+from errorReport import reduce_error_path_report, summarize_error_report, write_full_report
+from resultStore import save_results, discard_previous_results
+from workerPool.resourceLimits import exceeded_limit
+from serverConfig import settings
 
 
 
 
-"""
-Delete the validation directory for the given clientUUID.
-"""
-def delete_validation_directory(clientUUID):
-    # check if there is a skeleton dataset directory with this clientUUID as the name
-    path = os.path.join(expanduser("~"), "SODA", "skeleton", clientUUID)
-    if os.path.exists(path):
-        # remove the directory and all its contents
-        shutil.rmtree(path)
-
-
-# # return the errors from the error_path_report that should be shown to the user.
-# # as per Tom (developer of the Validator) for any paths (the keys in the Path_Error_Report object)
-# # return the ones that do not have any errors in their subpaths. 
-# # e.g., If given #/meta and #/meta/technique keys only return #/meta/technique (as this group doesn't have any subpaths)
+# return the errors from the error_path_report that should be shown to the user ( see errorReport.pathReportReducer )
 def parse(error_path_report):
-
-  user_errors = copy.deepcopy(error_path_report)
-
-  keys = error_path_report.keys()
-
-  # go through all paths and store the paths with the longest subpaths for each base 
-  # also store matching subpath lengths together
-  for k in keys:
-    prefix = get_path_prefix(k)
-
-    # check if the current path has inputs as a substring
-    if prefix.find("inputs") != -1:
-      # as per Tom ignore inputs paths' so
-      # remove the given prefix with 'inputs' in its path
-      del user_errors[k]
-      continue 
-
-    # check for a suffix indicator in the prefix (aka a forward slash at the end of the prefix)
-    if prefix[-1] == "/":
-      # if so remove the suffix and check if the resulting prefix is an existing path key
-      # indicating it can be removed from the errors_for_users dictionary as the current path
-      # will be an error in its subpath -- as stated in the function comment we avoid these errors 
-      prefix_no_suffix_indicator = prefix[0 : len(prefix) - 1]
-
-      if prefix_no_suffix_indicator in user_errors:
-        del user_errors[prefix_no_suffix_indicator]
-
-
-  
-  return user_errors
-  
-
-def get_path_prefix(path):
-  if path.count('/') == 1:
-    # get the entire path as the "prefix" and return it
-    return path
-  # get the path up to the final "/" and return it as the prefix
-  final_slash_idx = path.rfind("/")
-  return path[:final_slash_idx + 1]
+  return reduce_error_path_report(error_path_report)
 
 
 def remove_false_positives(parsed_report, blob):
 
     # remove the 'path_metadata' is a required proeprty error message
     if '#/' in parsed_report:
-        messages = parsed_report['#/']['messages']
-        # remove the message from the messages list with 'path_metadata' as a substring
-        for message in messages:
-            if 'path_metadata' in message:
-                messages.remove(message)
+        # the parsed report shares its error objects with the full report so replace the entry instead of editing it
+        # keep the messages without 'path_metadata' as a substring
+        error = parsed_report['#/']
+        parsed_report['#/'] = {**error, 'messages': [message for message in error['messages'] if 'path_metadata' not in message]}
         
 
 
@@ -90,27 +40,21 @@ def remove_false_positives(parsed_report, blob):
 
 # validate a local dataset at the target directory 
 def val_dataset_local_pipeline(ds_path, clientUUID):
-    results_path = os.path.join(expanduser("~"), "SODA", "results")
-    temp_log_path = os.path.join(expanduser("~"), "validation_progress.txt")
+    # NOTE: imported here since validator needs the namespaces configured, which workers do after importing this module
+    from validator import delete_validation_directory
 
-    if not os.path.exists(results_path):
-      os.mkdir(results_path)
+    discard_previous_results(clientUUID)
 
-    user_results_file = os.path.join(results_path, f"{clientUUID}.json")
-    if os.path.exists(user_results_file):
-      os.remove(user_results_file)
+    # continue the record the server started while building the skeleton ( or start one when run from the command line )
+    job_record = JobRecord.load(clientUUID) or JobRecord(clientUUID)
 
     print("About to clean metadata files")
     # clean the manifest and metadata files to prevent hanging caused by openpyxl trying to open manifest/metadata files with 
     # excessive amounts of empty rows/columns
-    skeleton_path = os.path.join(expanduser("~"), "SODA", "skeleton", clientUUID)
-    clean_metadata_files(path=SparCurPath(skeleton_path), cleaned_output_path=SparCurPath(skeleton_path))
+    skeleton_path = os.path.join(expanduser("~"), ds_path.strip())
+    with job_record.stage("clean"):
+        clean_metadata_files(path=SparCurPath(skeleton_path), cleaned_output_path=SparCurPath(skeleton_path))
     print("Cleaned metadata files")
-
-
-    # write to a file that we got this far
-    with open(temp_log_path, "w") as f:
-       f.write("Cleaned the metadata files")
       
     # convert the path to absolute from user's home directory
     joined_path = os.path.join(expanduser("~"), ds_path.strip())
@@ -131,59 +75,69 @@ def val_dataset_local_pipeline(ds_path, clientUUID):
     # validate the dataset
     blob = None 
     try: 
-        blob = validate(norm_ds_path)
+        with job_record.stage("validate"):
+            blob = validate(norm_ds_path)
     except Exception as e:
-       delete_validation_directory(ds_path) 
+       # a job that ran into its resource limits is reported as such by the worker
+       if exceeded_limit(e) is not None:
+          raise
+       delete_validation_directory(clientUUID) 
+       job_record.finish("Error")
        # write the results to a json file 
-       results = {"status": "Error", "error": str(e), "parsed_report": {}, "full_report": {}}
-       # write results to a json file
-       with open(user_results_file, "w") as f:
-            json.dump(results, f)
+       results = {"status": "Error", "error": str(e), "parsed_report": {}, "full_report": {}, "progress": job_record.to_dict()}
+       save_results(clientUUID, results)
        # we are done now
        return
 
     print("Finished validation")
 
-    # write to a file that we got this far
-    with open(temp_log_path, "w") as f:
-       f.write("Created the blob") 
-
-    delete_validation_directory(ds_path)
+    # in incremental mode the skeleton is kept so the client's next validation only has to apply what changed
+    if not settings.INCREMENTAL_SKELETON:
+        delete_validation_directory(clientUUID)
 
     if 'status' not in blob or 'path_error_report' not in blob['status']:
         # namespace_logger.info(f"{clientUUID}: 4.1 Validation Run Incomplete ( Guided: True )")
-        results = {"status": "Incomplete", "parsed_report": {}, "full_report": str(blob)}
-        # write results to a json file
-        with open(user_results_file, "w") as f:
-              json.dump(results, f)
+        # the full report is stored on its own, clients fetch it from /results/<clientUUID>/full_report
+        write_full_report(clientUUID, blob)
+        job_record.finish("Incomplete")
+        results = {"status": "Incomplete", "parsed_report": {}, "full_report": {}, "full_report_available": True, "progress": job_record.to_dict()}
+        save_results(clientUUID, results)
         return 
     
     # namespace_logger.info(f"{clientUUID}: 4.2 Parsing dataset results( Guided: True ) ")
     
-    # peel out the status object 
-    status = blob.get('status')
+    with job_record.stage("parse"):
+        # peel out the status object 
+        status = blob.get('status')
 
-    # peel out the path_error_report object
-    path_error_report = status.get('path_error_report')
+        # peel out the path_error_report object
+        path_error_report = status.get('path_error_report')
 
-    # get the errors out of the report that do not have errors in their subpaths (see function comments for the explanation)
-    parsed_report = parse(path_error_report)  
+        # get the errors out of the report that do not have errors in their subpaths (see function comments for the explanation)
+        parsed_report = parse(path_error_report)  
 
-    # remove any false positives from the report
-    # TODO: Implement the below function
-    remove_false_positives(parsed_report, blob)
+        # remove any false positives from the report
+        # TODO: Implement the below function
+        remove_false_positives(parsed_report, blob)
 
-    # write to a file that we got this far
-    with open(temp_log_path, "w") as f:
-       f.write("Parsed and Removed False Positives")
+        # group the repeated errors of large reports so clients can ask for a compact view
+        error_summary = summarize_error_report(parsed_report) if settings.ERROR_SUMMARY_ENABLED else None
 
-    results = {"status": "Complete", "parsed_report": parsed_report, "full_report": str(blob)}
-    with open(user_results_file, "w") as f:
-      json.dump(results, f)
+        # the full report is stored on its own, clients fetch it from /results/<clientUUID>/full_report
+        write_full_report(clientUUID, blob)
+
+    job_record.finish("Complete")
+    results = {"status": "Complete", "parsed_report": parsed_report, "full_report": {}, "full_report_available": True, "progress": job_record.to_dict()}
+    if error_summary is not None:
+        results["error_summary"] = error_summary
+    save_results(clientUUID, results)
 
 
 
 if __name__ == '__main__':
+    from namespaces import configure_namespaces
+    configure_namespaces()
+
     # get the args passed in from subprocess call
     args = sys.argv[1:]
     generation_location = args[0]
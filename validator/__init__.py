@@ -1 +1,3 @@
-from .validator import  create, has_required_metadata_files, createGuidedMode, delete_validation_directory
\ No newline at end of file
+from .validator import  create, has_required_metadata_files, createGuidedMode, delete_validation_directory, preload_templates
+from .streamingIngest import ingest_validation_request, is_streaming_available, StreamedPayloadError
+from .jobSpool import spool_request, build_spooled_dataset, discard_spooled_request
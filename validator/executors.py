@@ -0,0 +1,19 @@
+"""
+Executor factory for the parts of skeleton creation that fan out over independent files ( guided metadata ).
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+
+# the skeleton is built inside the daemonic validation workers, which can not start a process pool
+EXECUTOR_KINDS = ["thread"]
+
+
+def get_executor(kind, max_workers):
+    """
+    Return a thread pool executor with max_workers workers.
+    """
+    if kind not in EXECUTOR_KINDS:
+        raise ValueError(f"Unknown executor kind {kind}, expected one of {EXECUTOR_KINDS}")
+
+    return ThreadPoolExecutor(max_workers=max_workers)
@@ -0,0 +1,127 @@
+"""
+Incremental skeleton rebuilds. Instead of removing a client's skeleton and recreating every placeholder file on each
+validation, the skeleton is kept and a small state file records which directories, placeholder files and generated
+metadata/manifest files it holds. The next request is diffed against that state and only the paths that changed are touched.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+
+from serverConfig import settings
+from .skeletonMaterializer import collect_skeleton_entries, create_directories, create_placeholder_files
+
+
+def _state_path():
+    # kept outside of the skeleton itself so the validator never sees it
+    return settings.SKELETON_STATE_ROOT
+
+
+def _state_file(clientUUID):
+    return os.path.join(_state_path(), f"{clientUUID}.json")
+
+
+def _payload_hash(payload):
+    if not isinstance(payload, str):
+        payload = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SkeletonState:
+    def __init__(self, dirs=(), files=(), generated=None):
+        self.dirs = set(dirs)
+        self.files = set(files)
+        # group -> { relative path of a generated file -> hash of the payload it was written from }
+        self.generated = generated or {}
+
+    @classmethod
+    def load(cls, clientUUID, path):
+        """
+        Return the state of the client's existing skeleton at path or None if there is no usable skeleton to update.
+        """
+        if not os.path.isdir(path):
+            return None
+        try:
+            with open(_state_file(clientUUID), "r") as f:
+                state = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        return cls(state["dirs"], state["files"], state["generated"])
+
+    def save(self, clientUUID):
+        if not os.path.exists(_state_path()):
+            os.makedirs(_state_path(), exist_ok=True)
+        with open(_state_file(clientUUID), "w") as f:
+            json.dump({"dirs": sorted(self.dirs), "files": sorted(self.files), "generated": self.generated}, f)
+
+    def sync_tree(self, dataset_structure, path):
+        """
+        Bring the placeholder tree at path in line with dataset_structure, creating and removing only what changed.
+        Returns the number of paths that were created and removed.
+        """
+        dirs, files = collect_skeleton_entries(dataset_structure)
+
+        removed_files = self.files - files
+        removed_dirs = self.dirs - dirs
+        for relative_path in removed_files:
+            file_path = os.path.join(path, relative_path)
+            if os.path.isfile(file_path):
+                os.remove(file_path)
+        # deepest first so a parent is never removed before its children
+        for relative_path in sorted(removed_dirs, key=lambda p: p.count(os.sep), reverse=True):
+            shutil.rmtree(os.path.join(path, relative_path), ignore_errors=True)
+
+        added_dirs = dirs - self.dirs
+        added_files = files - self.files
+        create_directories(path, added_dirs)
+        create_placeholder_files(path, added_files)
+
+        self.dirs = dirs
+        self.files = files
+        return len(added_dirs) + len(added_files), len(removed_dirs) + len(removed_files)
+
+    def pending(self, group, struct, relative_path_for, path):
+        """
+        Return the entries of struct ( name -> payload ) whose generated file is missing or was written from a different
+        payload, removing their outdated files so they can be written again. Generated files of the group that are no longer
+        in struct are removed.
+        """
+        previous = self.generated.get(group, {})
+        current = {}
+        pending = {}
+        for name, payload in struct.items():
+            relative_path = relative_path_for(name)
+            payload_hash = _payload_hash(payload)
+            current[relative_path] = payload_hash
+
+            file_path = os.path.join(path, relative_path)
+            if previous.get(relative_path) == payload_hash and os.path.isfile(file_path):
+                continue
+            if os.path.isfile(file_path):
+                os.remove(file_path)
+            pending[name] = payload
+
+        for relative_path in set(previous) - set(current):
+            file_path = os.path.join(path, relative_path)
+            if os.path.isfile(file_path) and relative_path not in self.files:
+                os.remove(file_path)
+
+        self.generated[group] = current
+        return pending
+
+    def is_current(self, group, payload):
+        """
+        Return whether the files of group were last generated from payload, and record payload as the latest one.
+        """
+        payload_hash = _payload_hash(payload)
+        current = self.generated.get(group) == payload_hash
+        self.generated[group] = payload_hash
+        return current
+
+
+def delete_skeleton_state(clientUUID):
+    try:
+        os.remove(_state_file(clientUUID))
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,87 @@
+"""
+Accepted validation requests are spooled to disk and answered right away; a validation worker later builds the skeleton,
+metadata files and manifests from the spooled request as the first stages of the job. A streamed request ( see
+streamingIngest ) is spooled by reference: its placeholder trees and payload files stay in its staging area, which the
+spooled request owns from then on.
+"""
+
+import json
+import os
+import shutil
+
+from serverConfig import settings, storage
+from .streamingIngest import SpooledPayloads, SPOOLED_KEYS
+from .validator import create, createGuidedMode
+
+
+def spool_request(clientUUID, data, guided_mode, streamed_payload=None):
+    """
+    Write the client's validated request to the spool, replacing a previously spooled one.
+    """
+    spooled = {"guided_mode": guided_mode, "data": data, "trees": {}, "work_path": None}
+    if streamed_payload is not None:
+        # the payload files and trees are already on disk, only their paths are spooled
+        spooled["data"] = {key: (payloads.file_paths() if key in SPOOLED_KEYS else payloads) for key, payloads in data.items()}
+        spooled["trees"] = streamed_payload.trees
+        spooled["work_path"] = streamed_payload.work_path
+
+    discard_spooled_request(clientUUID)
+    os.makedirs(settings.SPOOL_ROOT, exist_ok=True)
+
+    # write then rename so a worker never reads a half written request
+    spool_file = storage.spool_file(clientUUID)
+    temp_file = f"{spool_file}.{os.getpid()}.tmp"
+    with open(temp_file, "w") as f:
+        json.dump(spooled, f)
+    os.replace(temp_file, spool_file)
+    if streamed_payload is not None:
+        streamed_payload.release()
+    return spool_file
+
+
+def _load_spooled_request(clientUUID):
+    with open(storage.spool_file(clientUUID), "r") as f:
+        spooled = json.load(f)
+
+    if spooled["work_path"] is not None:
+        for key in SPOOLED_KEYS:
+            payloads = SpooledPayloads()
+            for name, file_path in spooled["data"][key].items():
+                payloads.add(name, file_path)
+            spooled["data"][key] = payloads
+    return spooled
+
+
+def build_spooled_dataset(clientUUID, job_record):
+    """
+    Build the skeleton dataset of the client's spooled request and return its path. The spooled request is removed
+    whether or not the skeleton could be built.
+    """
+    try:
+        spooled = _load_spooled_request(clientUUID)
+        data = spooled["data"]
+        if spooled["guided_mode"]:
+            return createGuidedMode(data["dataset_structure"], clientUUID, data["manifests"], job_record=job_record,
+                                    materialized_skeleton=spooled["trees"].get("saved-datset-structure-json-obj"))
+        return create(data["dataset_structure"].get("dataset-structure"), data["manifests"], data["metadata_files"], clientUUID,
+                      job_record=job_record, materialized_skeleton=spooled["trees"].get("dataset-structure"))
+    finally:
+        discard_spooled_request(clientUUID)
+
+
+def discard_spooled_request(clientUUID):
+    """
+    Remove the client's spooled request, if any, together with the staging area of a streamed request.
+    """
+    spool_file = storage.spool_file(clientUUID)
+    try:
+        with open(spool_file, "r") as f:
+            work_path = json.load(f).get("work_path")
+    except FileNotFoundError:
+        return
+    except ValueError:
+        work_path = None
+
+    if work_path is not None:
+        shutil.rmtree(work_path, ignore_errors=True)
+    os.remove(spool_file)
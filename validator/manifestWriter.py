@@ -0,0 +1,93 @@
+"""
+Writes the manifest file of every high level folder of a skeleton dataset. Manifest rows are streamed straight from the
+request's JSON into a write-only openpyxl workbook ( or a CSV file ) instead of going through a pandas DataFrame and
+DataFrame.to_excel. Manifests are written one after another: openpyxl serializes while holding the GIL, so a thread pool
+adds nothing, and a process pool costs more than it saves ( see tools/benchmarks/benchmark_manifest_writer.py ).
+"""
+
+import csv
+import json
+import math
+import os
+
+from openpyxl import Workbook
+
+from serverConfig import settings
+
+
+MANIFEST_FILE_NAMES = {
+    "xlsx": "manifest.xlsx",
+    "csv": "manifest.csv",
+}
+
+
+def manifest_file_name(manifest_format=None):
+    return MANIFEST_FILE_NAMES[manifest_format or settings.MANIFEST_FORMAT]
+
+
+def _cell_value(value):
+    # pandas leaves missing values ( None / NaN ) as empty cells
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+
+def manifest_rows(manifest):
+    """
+    Return the header and a generator of rows of a manifest parsed from the client's JSON.
+    Accepts the layouts pandas.DataFrame accepts for manifests: column -> {row index -> value}, column -> [values]
+    and a list of row objects.
+    """
+    if isinstance(manifest, list):
+        header = []
+        for row in manifest:
+            header.extend(column for column in row if column not in header)
+        return header, ([_cell_value(row.get(column)) for column in header] for row in manifest)
+
+    header = list(manifest)
+    columns = [manifest[column] for column in header]
+    if all(isinstance(column, list) for column in columns):
+        row_count = max((len(column) for column in columns), default=0)
+        return header, ([_cell_value(column[i] if i < len(column) else None) for column in columns] for i in range(row_count))
+
+    # rows are ordered by their first appearance in any column, which matches pandas for the to_json layout the client sends
+    row_keys = dict.fromkeys(key for column in columns for key in column)
+    return header, ([_cell_value(column.get(key)) for column in columns] for key in row_keys)
+
+
+def write_manifest(manifest_obj, folder_path, manifest_format=None):
+    """
+    Write one manifest ( the client's JSON string ) into folder_path and return the path of the written file.
+    """
+    manifest_format = manifest_format or settings.MANIFEST_FORMAT
+    header, rows = manifest_rows(json.loads(manifest_obj))
+
+    # a manifest of another format left over from an earlier request would be read by sparcur as well
+    for other_name in MANIFEST_FILE_NAMES.values():
+        if other_name != manifest_file_name(manifest_format) and os.path.isfile(os.path.join(folder_path, other_name)):
+            os.remove(os.path.join(folder_path, other_name))
+
+    manifest_path = os.path.join(folder_path, manifest_file_name(manifest_format))
+    if manifest_format == "csv":
+        with open(manifest_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rows)
+        return manifest_path
+
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet()
+    worksheet.append(header)
+    for row in rows:
+        worksheet.append(row)
+    workbook.save(manifest_path)
+    return manifest_path
+
+
+def write_manifests(manifest_struct, path):
+    """
+    Write the manifest of every high level folder in manifest_struct ( folder name -> JSON string ) under path.
+    """
+    return [write_manifest(manifest_struct[key], os.path.join(path, key)) for key in manifest_struct]
@@ -0,0 +1,108 @@
+"""
+Materializes the placeholder tree of a skeleton dataset. Built for trees with 100k+ entries: the dataset-structure is walked
+iteratively ( no recursion depth limit ), directories are created in one pass ordered parents first, and placeholder files are
+created with raw os.open/os.write calls spread across a thread pool ( the calls release the GIL so the file system work overlaps ).
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from serverConfig import settings
+
+
+PLACEHOLDER_BODIES = {
+    "content": b"SODA",
+    "empty": b"",
+}
+
+# files smaller than this are not worth handing to the thread pool
+MIN_FILES_PER_CHUNK = 256
+
+# rough space a directory or placeholder file takes on a tmpfs ( one page plus inode and dentry )
+ESTIMATED_BYTES_PER_ENTRY = 4096 + 1024
+
+_FILE_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+
+
+def collect_skeleton_entries(dataset_structure):
+    """
+    Return the relative paths of the directories and files of a dataset-structure as two sets.
+    """
+    dirs = set()
+    files = set()
+    stack = [(dataset_structure, "")]
+    while stack:
+        folder, relative_path = stack.pop()
+        for folder_name, sub_folder in folder["folders"].items():
+            folder_path = os.path.join(relative_path, folder_name)
+            dirs.add(folder_path)
+            stack.append((sub_folder, folder_path))
+        for file_name in folder.get("files", {}):
+            files.add(os.path.join(relative_path, file_name))
+    return dirs, files
+
+
+def estimate_skeleton_bytes(dataset_structure, *payloads):
+    """
+    Estimate the space a skeleton of dataset_structure takes, including the metadata and manifest files written from payloads
+    ( dictionaries of file name -> JSON string ).
+    """
+    entries = 0
+    stack = [dataset_structure]
+    while stack:
+        folder = stack.pop()
+        entries += len(folder["folders"]) + len(folder.get("files", {}))
+        stack.extend(folder["folders"].values())
+
+    payload_bytes = sum(len(payload) for struct in payloads for payload in struct.values() if isinstance(payload, str))
+    return entries * ESTIMATED_BYTES_PER_ENTRY + payload_bytes
+
+
+def create_directories(path, relative_dirs):
+    # parents sort before their children so every mkdir finds its parent in place
+    for relative_path in sorted(relative_dirs, key=lambda p: p.count(os.sep)):
+        try:
+            os.mkdir(os.path.join(path, relative_path))
+        except FileExistsError:
+            pass
+
+
+def _create_files(path, relative_files, body):
+    for relative_path in relative_files:
+        fd = os.open(os.path.join(path, relative_path), _FILE_FLAGS, 0o644)
+        try:
+            if body:
+                os.write(fd, body)
+        finally:
+            os.close(fd)
+
+
+def create_placeholder_files(path, relative_files, placeholder_mode=None, max_workers=None):
+    """
+    Create a placeholder file for every relative path. The parent directories must already exist.
+    """
+    body = PLACEHOLDER_BODIES[placeholder_mode or settings.SKELETON_PLACEHOLDER_MODE]
+    max_workers = max_workers or settings.SKELETON_WRITER_THREADS
+    relative_files = list(relative_files)
+
+    if max_workers <= 1 or len(relative_files) <= MIN_FILES_PER_CHUNK:
+        _create_files(path, relative_files, body)
+        return
+
+    chunk_size = max(MIN_FILES_PER_CHUNK, len(relative_files) // (max_workers * 4) + 1)
+    chunks = [relative_files[i:i + chunk_size] for i in range(0, len(relative_files), chunk_size)]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # consume the results so an error in any chunk is raised here
+        for _ in executor.map(lambda chunk: _create_files(path, chunk, body), chunks):
+            pass
+
+
+def materialize_skeleton(dataset_structure, path, placeholder_mode=None, max_workers=None):
+    """
+    Create the directories and placeholder files of dataset_structure under the existing directory path.
+    Returns the number of directories and files created.
+    """
+    dirs, files = collect_skeleton_entries(dataset_structure)
+    create_directories(path, dirs)
+    create_placeholder_files(path, files, placeholder_mode, max_workers)
+    return len(dirs), len(files)
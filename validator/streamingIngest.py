@@ -0,0 +1,274 @@
+"""
+Streaming ingestion of /validate request bodies. A large body is parsed event by event: the dataset-structure trees are
+materialized as placeholder files while they are still being read and every manifest/metadata payload is spooled to its own
+file, so the whole document ( often hundreds of MB ) is never held in memory at once.
+
+Requires the optional ijson package; without it requests are always parsed with request.get_json().
+"""
+
+import json
+import os
+import shutil
+import uuid
+from collections.abc import Mapping
+
+from serverConfig import settings
+from resultCache import CanonicalDigest
+from .skeletonMaterializer import create_placeholder_files, MIN_FILES_PER_CHUNK
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+
+# keys of the dataset_structure object that hold a folder tree ( the free form and the guided mode tree )
+TREE_KEYS = ["dataset-structure", "saved-datset-structure-json-obj"]
+
+# keys of the request whose values are objects of file name -> JSON string
+SPOOLED_KEYS = ["manifests", "metadata_files"]
+
+# placeholder files are created in batches of this size while the tree is read
+FILE_BATCH_SIZE = MIN_FILES_PER_CHUNK * 16
+
+
+class StreamedPayloadError(ValueError):
+    """
+    Raised when a streamed request body is not a valid validation request.
+    """
+
+
+def is_streaming_available():
+    return ijson is not None
+
+
+class SpooledPayloads(Mapping):
+    """
+    Read only mapping of name -> payload string whose values live in files and are only read when accessed.
+    """
+
+    def __init__(self):
+        self._files = {}
+
+    def add(self, name, file_path):
+        self._files[name] = file_path
+
+    def __getitem__(self, name):
+        with open(self._files[name], "r", encoding="utf-8") as f:
+            return f.read()
+
+    def __iter__(self):
+        return iter(self._files)
+
+    def __len__(self):
+        return len(self._files)
+
+    def file_paths(self):
+        """
+        Return name -> path of the file holding the payload.
+        """
+        return dict(self._files)
+
+
+class _StreamReader:
+    """
+    File like wrapper of the request stream for ijson.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def read(self, size=-1):
+        # ijson probes the stream with read(0), which a werkzeug LimitedStream treats as a client disconnect
+        if size == 0:
+            return b""
+        return self.stream.read(size)
+
+
+def _digested_events(events, digest):
+    # every event passes the canonical digest, including those of the trees that are only materialized
+    for event, value in events:
+        digest.event(event, value)
+        yield event, value
+
+
+class StreamedPayload:
+    """
+    The outcome of streaming a request body.
+    data mirrors the parsed request except that the folder trees are missing from data["dataset_structure"] ( they are already
+    on disk, see materialized_tree ) and data["manifests"]/data["metadata_files"] are SpooledPayloads.
+    """
+
+    def __init__(self, work_path):
+        self.work_path = work_path
+        self.data = {}
+        self.trees = {}
+        # canonical digests of the members of the request ( see resultCache.canonicalDigest ), used for its cache key
+        self.member_digests = {}
+        self._released = False
+
+    def materialized_tree(self, tree_key):
+        """
+        Return the path of the placeholder tree built for tree_key, or None when the request did not contain it.
+        """
+        return self.trees.get(tree_key)
+
+    def release(self):
+        """
+        Hand the work area over to a new owner ( see jobSpool ), cleanup() leaves it in place from then on.
+        """
+        self._released = True
+
+    def cleanup(self):
+        if not self._released:
+            shutil.rmtree(self.work_path, ignore_errors=True)
+
+
+def _skip_value(events, event):
+    # consume the rest of a value whose first event was already read
+    if event not in ("start_map", "start_array"):
+        return
+    depth = 1
+    while depth:
+        event, _ = next(events)
+        if event in ("start_map", "start_array"):
+            depth += 1
+        elif event in ("end_map", "end_array"):
+            depth -= 1
+
+
+def _build_value(events, event, value):
+    # build the python object of a value whose first event was already read
+    if event not in ("start_map", "start_array"):
+        return value
+    builder = ijson.ObjectBuilder()
+    builder.event(event, value)
+    depth = 1
+    while depth:
+        event, value = next(events)
+        builder.event(event, value)
+        if event in ("start_map", "start_array"):
+            depth += 1
+        elif event in ("end_map", "end_array"):
+            depth -= 1
+    return builder.value
+
+
+def _materialize_tree(events, event, root_path):
+    """
+    Create the folders and placeholder files of a dataset-structure tree as its events are read.
+    Walks with an explicit stack so deeply nested trees can not exhaust the recursion limit.
+    """
+    if event != "start_map":
+        raise StreamedPayloadError("A dataset structure must be an object")
+
+    os.makedirs(root_path)
+    pending_files = []
+    # frames are ( kind, relative path ) where kind is folder ( a folder object ), folders or files ( name -> object maps )
+    stack = [("folder", "")]
+    while stack:
+        event, key = next(events)
+        kind, relative_path = stack[-1]
+        if event == "end_map":
+            stack.pop()
+            continue
+
+        event, value = next(events)
+        if kind == "folder":
+            if key in ("folders", "files") and event == "start_map":
+                stack.append((key, relative_path))
+            else:
+                _skip_value(events, event)
+        elif kind == "folders":
+            folder_path = os.path.join(relative_path, key)
+            os.mkdir(os.path.join(root_path, folder_path))
+            if event == "start_map":
+                stack.append(("folder", folder_path))
+            else:
+                _skip_value(events, event)
+        else:
+            pending_files.append(os.path.join(relative_path, key))
+            _skip_value(events, event)
+            if len(pending_files) >= FILE_BATCH_SIZE:
+                create_placeholder_files(root_path, pending_files)
+                pending_files = []
+
+    create_placeholder_files(root_path, pending_files)
+
+
+def _spool_payloads(events, event, spool_path):
+    if event != "start_map":
+        raise StreamedPayloadError("Manifests and metadata files must be objects")
+
+    os.makedirs(spool_path)
+    payloads = SpooledPayloads()
+    while True:
+        event, name = next(events)
+        if event == "end_map":
+            return payloads
+
+        payload = _build_value(events, *next(events))
+        if not isinstance(payload, str):
+            payload = json.dumps(payload)
+
+        file_path = os.path.join(spool_path, f"{len(payloads)}.json")
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write(payload)
+        payloads.add(name, file_path)
+
+
+def _read_dataset_structure(events, event, payload):
+    if event != "start_map":
+        raise StreamedPayloadError("dataset_structure must be an object")
+
+    dataset_structure = {}
+    while True:
+        event, key = next(events)
+        if event == "end_map":
+            return dataset_structure
+
+        event, value = next(events)
+        if key in TREE_KEYS:
+            tree_path = os.path.join(payload.work_path, "trees", str(len(payload.trees)))
+            _materialize_tree(events, event, tree_path)
+            payload.trees[key] = tree_path
+        else:
+            dataset_structure[key] = _build_value(events, event, value)
+
+
+def ingest_validation_request(stream):
+    """
+    Parse a /validate request body from stream. The caller owns the returned StreamedPayload and must call cleanup() on it.
+    """
+    # the work area sits inside the skeleton root so a materialized tree can be renamed into place without copying
+    payload = StreamedPayload(os.path.join(settings.SKELETON_ROOT, ".staging", uuid.uuid4().hex))
+    os.makedirs(payload.work_path)
+
+    digest = CanonicalDigest()
+    try:
+        events = _digested_events(ijson.basic_parse(_StreamReader(stream)), digest)
+        event, _ = next(events)
+        if event != "start_map":
+            raise StreamedPayloadError("The request body must be a JSON object")
+
+        while True:
+            event, key = next(events)
+            if event == "end_map":
+                break
+
+            event, value = next(events)
+            if key == "dataset_structure":
+                payload.data[key] = _read_dataset_structure(events, event, payload)
+            elif key in SPOOLED_KEYS:
+                payload.data[key] = _spool_payloads(events, event, os.path.join(payload.work_path, key))
+            else:
+                payload.data[key] = _build_value(events, event, value)
+    except (ijson.JSONError, StopIteration) as e:
+        payload.cleanup()
+        raise StreamedPayloadError(f"The request body is not valid JSON: {e}")
+    except Exception:
+        payload.cleanup()
+        raise
+
+    payload.member_digests = digest.member_digests
+    return payload
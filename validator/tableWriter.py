@@ -0,0 +1,63 @@
+"""
+Bulk writing of tables into openpyxl worksheets. Cells are addressed by row and column index instead of "A1" style keys and
+every distinct style is resolved once per workbook and then shared by all the cells that use it, instead of building a new
+Font for every cell.
+"""
+
+from itertools import count
+
+from openpyxl.styles.cell_style import StyleArray
+from openpyxl.utils import get_column_letter
+
+
+def excel_columns(start_index=0):
+    """
+    Yield the column letters starting at the 0-based column start_index ( "A", "B", ..., "Z", "AA", ..., "XFD" ).
+    """
+    for column_index in count(start_index + 1):
+        yield get_column_letter(column_index)
+
+
+class CellStyle:
+    """
+    A set of cell styles ( font, fill ) shared by every cell of a workbook it is applied to.
+    The style objects are registered with the workbook for the first cell only, later cells reuse the resolved style ids.
+    Other styles of a cell ( borders, number formats, ... ) are left as they are.
+    """
+
+    def __init__(self, font=None, fill=None):
+        self.font = font
+        self.fill = fill
+        self._workbook = None
+        self._font_id = None
+        self._fill_id = None
+
+    def apply(self, cell):
+        workbook = cell.parent.parent
+        if workbook is not self._workbook:
+            if self.font is not None:
+                cell.font = self.font
+            if self.fill is not None:
+                cell.fill = self.fill
+            self._workbook = workbook
+            self._font_id = cell._style.fontId
+            self._fill_id = cell._style.fillId
+            return
+
+        if not cell._style:
+            cell._style = StyleArray()
+        if self.font is not None:
+            cell._style.fontId = self._font_id
+        if self.fill is not None:
+            cell._style.fillId = self._fill_id
+
+
+def write_rows(worksheet, rows, start_row=1, start_column=1, style=None):
+    """
+    Write rows ( iterables of values ) into worksheet starting at the 1-based start_row and start_column.
+    """
+    for row_index, row in enumerate(rows, start=start_row):
+        for column_index, value in enumerate(row, start=start_column):
+            cell = worksheet.cell(row=row_index, column=column_index, value=value)
+            if style is not None:
+                style.apply(cell)
@@ -0,0 +1,97 @@
+"""
+In-memory cache of the metadata template workbooks in TEMPLATE_PATH. Every template is unzipped and parsed once, a pickled
+snapshot of the pristine workbook is kept and every job gets its own workbook unpickled from that snapshot, which is several
+times cheaper than load_workbook. A template is parsed again when its file changes on disk ( mtime or size ).
+"""
+
+import io
+import os
+import pickle
+import threading
+
+from openpyxl import load_workbook
+
+from namespaces import NamespaceEnum, get_namespace_logger
+from serverConfig import settings
+
+
+# the templates guided mode fills in
+TEMPLATE_FILE_NAMES = ["subjects.xlsx", "samples.xlsx", "submission.xlsx", "dataset_description.xlsx"]
+
+
+class _CachedTemplate:
+    def __init__(self, signature, snapshot, raw_bytes):
+        self.signature = signature
+        # pickled pristine workbook, or None when the workbook could not be pickled and raw_bytes are parsed instead
+        self.snapshot = snapshot
+        self.raw_bytes = raw_bytes
+
+    def clone(self):
+        if self.snapshot is not None:
+            return pickle.loads(self.snapshot)
+        return load_workbook(io.BytesIO(self.raw_bytes))
+
+
+class TemplateWorkbookCache:
+    def __init__(self, template_path):
+        self.template_path = template_path
+        self._templates = {}
+        self._lock = threading.Lock()
+
+    def load(self, file_name):
+        """
+        Return a new workbook holding a pristine copy of the template file_name. Raises FileNotFoundError without the template.
+        """
+        file_path = os.path.join(self.template_path, file_name)
+        stat = os.stat(file_path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            template = self._templates.get(file_name)
+            if template is None or template.signature != signature:
+                template = self._parse(file_path, signature)
+                self._templates[file_name] = template
+
+        return template.clone()
+
+    def preload(self, file_names=TEMPLATE_FILE_NAMES):
+        """
+        Parse every template that exists so the first job does not pay for it.
+        """
+        for file_name in file_names:
+            try:
+                self.load(file_name)
+            except FileNotFoundError:
+                get_namespace_logger(NamespaceEnum.VALIDATE_DATASET).info(f"Metadata template {file_name} not found in {self.template_path}")
+
+    def _parse(self, file_path, signature):
+        with open(file_path, "rb") as f:
+            raw_bytes = f.read()
+
+        workbook = load_workbook(io.BytesIO(raw_bytes))
+        try:
+            snapshot = pickle.dumps(workbook, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            get_namespace_logger(NamespaceEnum.VALIDATE_DATASET).info(f"Metadata template {file_path} can not be snapshotted, it is parsed for every job: {e}")
+            snapshot = None
+        return _CachedTemplate(signature, snapshot, raw_bytes)
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_template_cache(template_path):
+    with _caches_lock:
+        if template_path not in _caches:
+            _caches[template_path] = TemplateWorkbookCache(template_path)
+        return _caches[template_path]
+
+
+def load_template(template_path, file_name):
+    """
+    Return a fresh workbook for the template file_name in template_path, from the in-memory cache unless it is disabled.
+    """
+    if not settings.TEMPLATE_CACHE_ENABLED:
+        return load_workbook(os.path.join(template_path, file_name))
+    return get_template_cache(template_path).load(file_name)
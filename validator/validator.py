@@ -10,15 +10,23 @@ Works within Organize Datasets to allow a user to validate their dataset before
 from flask import Flask, abort
 import os
 import shutil
+import time
 from xml.dom import InvalidStateErr
 from os.path import expanduser
 import pandas as pd 
 import json 
 from namespaces import NamespaceEnum, get_namespace_logger
-from openpyxl import load_workbook
+from jobProgress import JobRecord
+from serverConfig import settings, storage
+from .incrementalSkeleton import SkeletonState, delete_skeleton_state
+from .skeletonMaterializer import materialize_skeleton, estimate_skeleton_bytes
+from .manifestWriter import write_manifests, manifest_file_name
+from .tableWriter import CellStyle, excel_columns, write_rows
+from .templateCache import load_template, get_template_cache
+from .executors import get_executor
 from openpyxl.styles import PatternFill, Font
+from openpyxl.utils import get_column_letter
 import numpy as np
-from string import ascii_uppercase
 import itertools
 
 
@@ -28,13 +36,20 @@ app = Flask(__name__)
 
 
 
-path = os.path.join(expanduser("~"), "SODA", "skeleton")
-completed_jobs_dir = os.path.join(expanduser("~"), "SODA", "completed_jobs")
+path = settings.SKELETON_ROOT
+completed_jobs_dir = settings.COMPLETED_JOBS_ROOT
 
 namespace_logger = get_namespace_logger(NamespaceEnum.VALIDATE_DATASET)
 
 TEMPLATE_PATH = expanduser("~") + "/file_templates"
 
+def preload_templates():
+    """
+    Parse the guided mode metadata templates into the template cache ahead of the first guided job.
+    """
+    if settings.TEMPLATE_CACHE_ENABLED:
+        get_template_cache(TEMPLATE_PATH).preload()
+
 
 def has_required_metadata_files(metadata_files_json):
     """
@@ -69,20 +84,8 @@ def create_skeleton(dataset_structure, path):
     """
     Create a skeleton of the dataset structure on the user's filesystem.
     """
-    for folder in dataset_structure["folders"]:
-        dp = (os.path.join(path, folder)) 
-        if not os.path.exists(dp):
-            os.mkdir(dp)
-
-        create_skeleton(dataset_structure["folders"][folder], os.path.join(path, folder))
-    if "files" in dataset_structure:
-        for file_key in dataset_structure["files"]:
-            # TODO: If the type is bf then create a generic file with the name of the file key ( and write information to it )
-            # if dataset_structure["files"][file_key]["type"] in ["bf"]:
-            #     continue
-                
-            with open(os.path.join(path, file_key), "w") as f:
-                f.write("SODA")
+    # TODO: If the type is bf then create a generic file with the name of the file key ( and write information to it )
+    materialize_skeleton(dataset_structure, path)
 
 def validate_validation_result(export):
     """
@@ -106,14 +109,8 @@ def validate_validation_result(export):
 ### Free Form Mode Skeleton Dataset Creation ###
 
 def create_manifests(manifest_struct, path):
-   # go through the high level keys
-   for key in manifest_struct:
-      manifest_obj = manifest_struct[key]
-
-      manifest_df = pd.DataFrame(json.loads(manifest_obj))
-
-      # write to the ~/SODA/skeleton/key folder
-      manifest_df.to_excel(f"{path}/{key}/manifest.xlsx", index=False)
+   # write a manifest to the ~/SODA/skeleton/key folder of every high level key
+   write_manifests(manifest_struct, path)
 
 def create_metadata_files(metadata_struct, path):
    for metadata_file_name in metadata_struct:
@@ -129,41 +126,91 @@ def create_metadata_files(metadata_struct, path):
 
         metadata_df.to_excel(f"{path}/{metadata_file_name}", index=False, engine="openpyxl")
 
-def create(dataset_structure, manifests_struct, metadata_files, clientUUID):
+def prepare_skeleton_directory(clientUUID, estimated_bytes=0):
     """
-    Creates a skeleton dataset ( a set of empty data files but with valid metadata files ) of the given soda_json_structure on the local machine.
-    Used for validating a user's dataset before uploading it to Pennsieve.
-    NOTE: This function is only used for validating datasets ( both local and on Pennsieve ) that are being organized in the Organize Datasets feature of SODA.
-    The reason for this being that those datasets may exist in multiple locations on a user's filesystem ( or even on multiple machines ) and therefore cannot be validated 
-    until they have been put together in a single location.
-
+    Return the path of the client's skeleton directory and, in incremental mode, the state of the skeleton it already holds.
+    Without a usable previous skeleton the directory is recreated empty, on tmpfs when the estimated size of the skeleton
+    fits the tmpfs budget ( see serverConfig.storage ). The state is None when incremental mode is off.
     """
-    path = os.path.join(expanduser("~"), "SODA", "skeleton")
+    existing_path = storage.skeleton_path(clientUUID)
+
+    state = None
+    if settings.INCREMENTAL_SKELETON:
+        state = SkeletonState.load(clientUUID, existing_path)
+        if state is not None:
+            return existing_path, state
+        state = SkeletonState()
+
+    # check if the unique path for the client exists
+    if os.path.exists(existing_path):
+        # remove the directory and all its contents
+        # TODO: ensure no critical/root directories can be deleted. Likely run as non-super user should fix this. 
+        shutil.rmtree(existing_path)
+
+    path = storage.choose_skeleton_root(estimated_bytes)
 
     # check if the skeleton directory exists
     if not os.path.exists(path):
         # create the skeleton directory
-        os.makedirs(path)
+        os.makedirs(path, exist_ok=True)
 
-    # check if the unique path for the client exists
     path = os.path.join(path, clientUUID)
-    if os.path.exists(path):
-        # remove the directory and all its contents
-        # TODO: ensure no critical/root directories can be deleted. Likely run as non-super user should fix this. 
-        shutil.rmtree(path)
     
     # create the directory for the client
     os.mkdir(path)
 
-    create_skeleton(dataset_structure, path)
+    return path, state
 
-    # create metadata files 
-    namespace_logger.info("{clientUUID}: 2. Creating Metadata Files ( Guided: False )")
-    create_metadata_files(metadata_files, path)
+def adopt_materialized_skeleton(materialized_path, clientUUID):
+    """
+    Move a placeholder tree that was already built inside the skeleton root ( see streamingIngest ) into the client's
+    skeleton directory. The skeleton stage is timed by whoever built the tree.
+    """
+    delete_validation_directory(clientUUID)
+    path = os.path.join(settings.SKELETON_ROOT, clientUUID)
+    os.rename(materialized_path, path)
+    return path
 
-    # use pandas to parse the manifest files as data frames then write them to the correct folder
-    namespace_logger.info("{clientUUID}: 3. Creating Manifest Files ( Guided: False )")
-    create_manifests(manifests_struct, path)
+def create(dataset_structure, manifests_struct, metadata_files, clientUUID, job_record=None, materialized_skeleton=None):
+    """
+    Creates a skeleton dataset ( a set of empty data files but with valid metadata files ) of the given soda_json_structure on the local machine.
+    Used for validating a user's dataset before uploading it to Pennsieve.
+    NOTE: This function is only used for validating datasets ( both local and on Pennsieve ) that are being organized in the Organize Datasets feature of SODA.
+    The reason for this being that those datasets may exist in multiple locations on a user's filesystem ( or even on multiple machines ) and therefore cannot be validated 
+    until they have been put together in a single location.
+
+    Stage timings are recorded on job_record ( a new record for clientUUID is started when none is given ).
+    When materialized_skeleton is given the placeholder tree was built while the request was streamed in and is adopted as is.
+    """
+    job_record = job_record or JobRecord(clientUUID)
+
+    if materialized_skeleton is not None:
+        path, state = adopt_materialized_skeleton(materialized_skeleton, clientUUID), None
+    else:
+        path, state = prepare_skeleton_directory(clientUUID, estimate_skeleton_bytes(dataset_structure, manifests_struct, metadata_files))
+
+        with job_record.stage("skeleton"):
+            if state is None:
+                create_skeleton(dataset_structure, path)
+            else:
+                state.sync_tree(dataset_structure, path)
+
+    # create metadata files 
+    namespace_logger.info(f"{clientUUID}: 2. Creating Metadata Files ( Guided: False )")
+    with job_record.stage("metadata"):
+        if state is not None:
+            metadata_files = state.pending("metadata", metadata_files, lambda name: name, path)
+        create_metadata_files(metadata_files, path)
+
+    # write the manifest files to the correct folder
+    namespace_logger.info(f"{clientUUID}: 3. Creating Manifest Files ( Guided: False )")
+    with job_record.stage("manifests"):
+        if state is not None:
+            manifests_struct = state.pending("manifests", manifests_struct, lambda key: os.path.join(key, manifest_file_name()), path)
+        create_manifests(manifests_struct, path)
+
+    if state is not None:
+        state.save(clientUUID)
 
     return path
 
@@ -222,156 +269,80 @@ samplesTemplateHeaderList = [
     "protocol url or doi",
 ]
 
-# transpose a matrix (array of arrays)
-def transposeMatrix(matrix):
-    return [[matrix[j][i] for j in range(len(matrix))] for i in range(len(matrix[0]))]
-
+def normalize_metadata_table(table, template_headers, template_columns):
+    """
+    Normalize a subjects/samples table ( rows, header row first ) as sent by the UI in one columnar step.
+    The first template_columns columns are reordered to follow template_headers ( columns with other headers follow them ) and
+    the custom columns after them are dropped when they hold no value. Returns the rows of the normalized table.
+    """
+    columns = np.array(table, dtype=object)
+    if columns.ndim != 2:
+        raise ValueError("Every row of a metadata table must have the same number of columns")
 
-# helper function to process custom fields (users add and name them) for subjects and samples files
-def processMetadataCustomFields(matrix):
-    return [column for column in matrix if any(column[1:])]
+    header = [str(name).lower() for name in columns[0, :template_columns]]
+    header_index = {}
+    for index, name in enumerate(header):
+        header_index.setdefault(name, index)
 
-# needed to sort subjects and samples table data to match the UI fields
-def sortedSubjectsTableData(matrix, fields):
-    sortedMatrix = []
-    for field in fields:
-        for column in matrix:
-            if column[0].lower() == field:
-                sortedMatrix.append(column)
-                break
+    template_header_set = set(template_headers)
+    order = [header_index[field] for field in template_headers if field in header_index]
+    order += [index for index, name in enumerate(header) if name not in template_header_set]
 
-    customHeaderMatrix = [
-        column for column in matrix if column[0].lower() not in fields
-    ]
+    # keep the custom columns that have a value in any row
+    custom_values = columns[1:, template_columns:].astype(bool)
+    order += (np.flatnonzero(custom_values.any(axis=0)) + template_columns).tolist()
 
-    return (
-        np.concatenate((sortedMatrix, customHeaderMatrix)).tolist()
-        if customHeaderMatrix
-        else sortedMatrix
-    )
+    return columns[:, order].tolist()
 
 
-def excel_columns(start_index=0):
+def write_metadata_table(worksheet, table, template_columns):
     """
-    NOTE: does not support more than 699 contributors/links
+    Write a subjects/samples table ( header row first ) into a template worksheet. The template already holds the headers of
+    the first template_columns columns, the custom headers after them are added with the template's header style.
     """
-    single_letter = list(ascii_uppercase[start_index:])
-    two_letter = [a + b for a, b in itertools.product(ascii_uppercase, ascii_uppercase)]
-    return single_letter + two_letter
+    header_style = CellStyle(
+        font=Font(bold=True, size=12, name="Calibri"),
+        fill=PatternFill(start_color="FFD965", end_color="FFD965", fill_type="solid"),
+    )
+    write_rows(worksheet, [table[0][template_columns:]], start_column=template_columns + 1, style=header_style)
 
+    value_style = CellStyle(font=Font(bold=False, size=11, name="Arial"))
+    write_rows(worksheet, ([value or "" for value in row] for row in table[1:]), start_row=2, style=value_style)
 
-def save_subjects_file(filepath, datastructure):
 
-    source = os.path.join(TEMPLATE_PATH, "subjects.xlsx")
+def save_subjects_file(filepath, datastructure):
 
     destination = filepath
-
-    shutil.copyfile(source, destination)
-    wb = load_workbook(destination)
+    wb = load_template(TEMPLATE_PATH, "subjects.xlsx")
     ws1 = wb["Sheet1"]
 
-    transposeDatastructure = transposeMatrix(datastructure)
-
-    mandatoryFields = transposeDatastructure[:11]
-    optionalFields = transposeDatastructure[11:]
-    refinedOptionalFields = processMetadataCustomFields(optionalFields)
+    refinedDatastructure = normalize_metadata_table(datastructure, subjectsTemplateHeaderList, 11)
 
-    templateHeaderList = subjectsTemplateHeaderList
-    sortMatrix = sortedSubjectsTableData(mandatoryFields, templateHeaderList)
-
-    if refinedOptionalFields:
-        refinedDatastructure = transposeMatrix(
-            np.concatenate((sortMatrix, refinedOptionalFields))
-        )
-    else:
-        refinedDatastructure = transposeMatrix(sortMatrix)
-    
     # 1. delete rows using delete_rows(index, amount=2) -- description and example rows
     # ws1.delete_rows(2, 2)
     # delete all optional columns first (from the template)
     ws1.delete_cols(12, 18)
 
     # 2. see if the length of datastructure[0] == length of datastructure. If yes, go ahead. If no, add new columns from headers[n-1] onward.
-    headers_no = len(refinedDatastructure[0])
-    orangeFill = PatternFill(
-        start_color="FFD965", end_color="FFD965", fill_type="solid"
-    )
-
-    # gevent.sleep(0)
-    for column, header in zip(
-        excel_columns(start_index=11), refinedDatastructure[0][11:headers_no]
-    ):
-        cell = column + str(1)
-        ws1[cell] = header
-        ws1[cell].fill = orangeFill
-        ws1[cell].font = Font(bold=True, size=12, name="Calibri")
-
-    # gevent.sleep(0)
     # 3. populate matrices
-    for i, item in enumerate(refinedDatastructure):
-        if i == 0:
-            continue
-        for column, j in zip(excel_columns(start_index=0), range(len(item))):
-            # import pdb; pdb.set_trace()
-            cell = column + str(i + 1)
-            ws1[cell] = refinedDatastructure[i][j] or ""
-            ws1[cell].font = Font(bold=False, size=11, name="Arial")
+    write_metadata_table(ws1, refinedDatastructure, 11)
 
     wb.save(destination)
 
 
 def save_samples_file(filepath, datastructure):
-    source = os.path.join(TEMPLATE_PATH, "samples.xlsx")
-
     destination = filepath
 
-    shutil.copyfile(source, destination)
-
-    wb = load_workbook(destination)
+    wb = load_template(TEMPLATE_PATH, "samples.xlsx")
     ws1 = wb["Sheet1"]
 
-    transposeDatastructure = transposeMatrix(datastructure)
-
-    mandatoryFields = transposeDatastructure[:9]
-    optionalFields = transposeDatastructure[9:]
-    refinedOptionalFields = processMetadataCustomFields(optionalFields)
-
-    templateHeaderList = samplesTemplateHeaderList
-    sortMatrix = sortedSubjectsTableData(mandatoryFields, templateHeaderList)
-
-    if refinedOptionalFields:
-        refinedDatastructure = transposeMatrix(
-            np.concatenate((sortMatrix, refinedOptionalFields))
-        )
-    else:
-        refinedDatastructure = transposeMatrix(sortMatrix)
+    refinedDatastructure = normalize_metadata_table(datastructure, samplesTemplateHeaderList, 9)
 
     ws1.delete_cols(10, 15)
 
     # 2. see if the length of datastructure[0] == length of datastructure. If yes, go ahead. If no, add new columns from headers[n-1] onward.
-    headers_no = len(refinedDatastructure[0])
-    orangeFill = PatternFill(
-        start_color="FFD965", end_color="FFD965", fill_type="solid"
-    )
-    # gevent.sleep(0)
-    for column, header in zip(
-        excel_columns(start_index=9), refinedDatastructure[0][9:headers_no]
-    ):
-        cell = column + str(1)
-        ws1[cell] = header
-        ws1[cell].fill = orangeFill
-        ws1[cell].font = Font(bold=True, size=12, name="Calibri")
-
-    # gevent.sleep(0)
     # 3. populate matrices
-    for i, item in enumerate(refinedDatastructure):
-        if i == 0:
-            continue
-        for column, j in zip(excel_columns(start_index=0), range(len(item))):
-            # import pdb; pdb.set_trace()
-            cell = column + str(i + 1)
-            ws1[cell] = refinedDatastructure[i][j] or ""
-            ws1[cell].font = Font(bold=False, size=11, name="Arial")
+    write_metadata_table(ws1, refinedDatastructure, 9)
 
     wb.save(destination)
 
@@ -381,10 +352,10 @@ def rename_headers(workbook, max_len, start_index):
     Rename header columns if values exceed 3. Change Additional Values to Value 4, 5,...
     """
 
-    columns_list = excel_columns(start_index=start_index)
     if max_len >= start_index:
-        workbook[columns_list[0] + "1"] = "Value"
-        for i, column in zip(range(2, max_len + 1), columns_list[1:]):
+        workbook[get_column_letter(start_index + 1) + "1"] = "Value"
+        for i in range(2, max_len + 1):
+            column = get_column_letter(start_index + i)
 
             workbook[column + "1"] = f"Value {str(i)}"
             cell = workbook[column + "1"]
@@ -398,25 +369,20 @@ def rename_headers(workbook, max_len, start_index):
             cell.font = font
 
     else:
-        delete_range = len(columns_list) - max_len
-        workbook.delete_cols(4 + max_len, delete_range)
+        # remove every value column after the last one in use
+        delete_range = workbook.max_column - (3 + max_len)
+        if delete_range > 0:
+            workbook.delete_cols(4 + max_len, delete_range)
 
 
 def save_submission_file(filepath, val_arr):
 
     font_submission = Font(name="Calibri", size=14, bold=False)
 
-    source = os.path.join(TEMPLATE_PATH, "submission.xlsx")
-
     destination = filepath
 
-    try:
-        shutil.copyfile(source, destination)
-    except FileNotFoundError as e:
-        raise e
-
     # write to excel file
-    wb = load_workbook(destination)
+    wb = load_template(TEMPLATE_PATH, "submission.xlsx")
     ws1 = wb["Sheet1"]
     for column, arr in zip(excel_columns(start_index=2), val_arr):
         ws1[column + "2"] = arr["award"]
@@ -520,9 +486,9 @@ def grayout_subheaders(workbook, max_len, start_index):
     Gray out sub-header rows for values exceeding 3 (SDS2.0).
     """
     headers_list = ["4", "10", "18", "23", "28"]
-    columns_list = excel_columns(start_index=start_index)
 
-    for (i, column), no in itertools.product(zip(range(2, max_len + 1), columns_list[1:]), headers_list):
+    columns = [get_column_letter(start_index + i) for i in range(2, max_len + 1)]
+    for column, no in itertools.product(columns, headers_list):
         cell = workbook[column + no]
         fillColor("B2B2B2", cell)
 
@@ -531,9 +497,9 @@ def grayout_single_value_rows(workbook, max_len, start_index):
     Gray out rows where only single values are allowed. Row number: 2, 3, 5, 6, 9, 11, 12, 13, 17, 29, 30
     """
 
-    columns_list = excel_columns(start_index=start_index)
     row_list = ["2", "3", "5", "6", "9", "11", "12", "13", "17", "29", "30"]
-    for (i, column), no in itertools.product(zip(range(2, max_len + 1), columns_list[1:]), row_list):
+    columns = [get_column_letter(start_index + i) for i in range(2, max_len + 1)]
+    for column, no in itertools.product(columns, row_list):
         cell = workbook[column + no]
         fillColor("CCCCCC", cell)
 
@@ -545,12 +511,8 @@ def save_ds_description_file(
     con_str,
     related_info_str,
 ):
-    source = os.path.join(TEMPLATE_PATH, "dataset_description.xlsx")
-
     destination = filepath
 
-    shutil.copyfile(source, destination)
-
     # json array to python list
     val_obj_study = study_str
     val_obj_ds = dataset_str
@@ -558,7 +520,7 @@ def save_ds_description_file(
     val_arr_related_info = related_info_str
 
     # write to excel file
-    wb = load_workbook(destination)
+    wb = load_template(TEMPLATE_PATH, "dataset_description.xlsx")
     ws1 = wb["Sheet1"]
 
     ws1["D22"] = ""
@@ -603,17 +565,46 @@ def save_ds_description_file(
 
 
 
-def create_metadata_files_guided(dataset_structure, path, clientUUID):
+# every file create_metadata_files_guided can write to the root of the skeleton
+GUIDED_METADATA_FILES = ["subjects.xlsx", "samples.xlsx", "submission.xlsx", "dataset_description.xlsx", "README.txt", "CHANGES.txt"]
+
+class MetadataGenerationError(Exception):
+    """
+    Raised when one or more guided mode metadata files could not be written. errors maps each failed file to its exception.
+    """
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__("Could not create metadata files: " + "; ".join(f"{name}: {error}" for name, error in errors.items()))
+
+
+def write_text_file(file_path, text):
+    with open(file_path, "w") as f:
+        f.write(text)
+
+
+def _run_metadata_task(task):
+    # module level so it can be pickled for a process pool, returns the seconds the file took to write
+    file_name, function, args = task
+    started_at = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - started_at
+
+
+def guided_metadata_tasks(dataset_structure, path):
+    """
+    Return the ( file name, function, args ) task writing every guided mode metadata file. The tasks share no state.
+    """
+    tasks = []
+
     # get the table data for subjects and samples 
     subject_table_data = dataset_structure["subjects-table-data"]
     samples_table_data = dataset_structure["samples-table-data"]
 
     if len(subject_table_data) > 0:
-      namespace_logger.info("{clientUUID}: 2.1 Creating subjects.xlsx ( Guided: True )")
-      save_subjects_file( path + "/subjects.xlsx", subject_table_data)
+      tasks.append(("subjects.xlsx", save_subjects_file, (path + "/subjects.xlsx", subject_table_data)))
     if len(samples_table_data) > 0:
-      namespace_logger.info("{clientUUID}: 2.2 Creating samples.xlsx ( Guided: True )")
-      save_samples_file( path + "/samples.xlsx", samples_table_data)
+      tasks.append(("samples.xlsx", save_samples_file, (path + "/samples.xlsx", samples_table_data)))
 
     guidedSparcAward = dataset_structure["dataset-metadata"]["shared-metadata"]["sparc-award"];
     guidedMilestones = dataset_structure["dataset-metadata"]["submission-metadata"]["milestones"];
@@ -632,8 +623,7 @@ def create_metadata_files_guided(dataset_structure, path, clientUUID):
         for milestone in guidedMilestones
     )
     
-    namespace_logger.info("{clientUUID}: 2.3 Creating submission.xlsx ( Guided: True )")
-    save_submission_file(path + "/submission.xlsx", guidedSubmissionMetadataJSON)
+    tasks.append(("submission.xlsx", save_submission_file, (path + "/submission.xlsx", guidedSubmissionMetadataJSON)))
 
     # dataset description 
     guidedDatasetInformation = dataset_structure["dataset-metadata"]["description-metadata"]["dataset-information"];
@@ -662,54 +652,106 @@ def create_metadata_files_guided(dataset_structure, path, clientUUID):
     guidedProtocols = dataset_structure["dataset-metadata"]["description-metadata"]["protocols"];
     allDatasetLinks = guidedAdditionalLinks + guidedProtocols
 
-    namespace_logger.info("{clientUUID}: 2.4 Creating dataset_description.xlsx ( Guided: True )")
-    save_ds_description_file(path + "/dataset_description.xlsx", guidedDatasetInformation, guidedStudyInformation, guidedContributorInformation, allDatasetLinks)
+    tasks.append(("dataset_description.xlsx", save_ds_description_file, (path + "/dataset_description.xlsx", guidedDatasetInformation, guidedStudyInformation, guidedContributorInformation, allDatasetLinks)))
 
     ## README and CHANGES Metadata variables
     guidedReadMeMetadata = dataset_structure["dataset-metadata"]["README"];
     guidedChangesMetadata = dataset_structure["dataset-metadata"]["CHANGES"];
 
     # create text file called readme.txt in skeleton directory 
-    file_path = os.path.join(path, "README.txt")
-
-    namespace_logger.info("{clientUUID}: 2.5 Creating README.txt ( Guided: True )")
-    with open(file_path, "w") as f:
-        f.write(guidedReadMeMetadata)
+    tasks.append(("README.txt", write_text_file, (os.path.join(path, "README.txt"), guidedReadMeMetadata)))
 
-    namespace_logger.info("{clientUUID}: 2.6 Creating CHANGES.txt ( Guided: True )")
-    file_path = os.path.join(path, "CHANGES.txt")
     if len(guidedChangesMetadata) > 0:
-       with open(file_path, "w") as f:
-          f.write(guidedChangesMetadata)
+      tasks.append(("CHANGES.txt", write_text_file, (os.path.join(path, "CHANGES.txt"), guidedChangesMetadata)))
 
+    return tasks
 
-def createGuidedMode(soda_json_structure, clientUUID, manifests_struct):
-  
-  dataset_structure = soda_json_structure["saved-datset-structure-json-obj"]
 
-  path = os.path.join(expanduser("~"), "SODA", "skeleton")
+def create_metadata_files_guided(dataset_structure, path, clientUUID):
+    """
+    Write the guided mode metadata files into the skeleton at path, concurrently on a thread pool.
+    Every file is attempted; when any of them fails the files that were written are removed and a MetadataGenerationError
+    listing all failures is raised. Returns the seconds each file took to write.
+    """
+    tasks = guided_metadata_tasks(dataset_structure, path)
+    namespace_logger.info(f"{clientUUID}: 2.1 Creating {', '.join(name for name, _, _ in tasks)} ( Guided: True )")
+
+    timings = {}
+    errors = {}
+    if settings.GUIDED_METADATA_WORKERS <= 1:
+      for task in tasks:
+        try:
+          timings[task[0]] = _run_metadata_task(task)
+        except Exception as e:
+          errors[task[0]] = e
+    else:
+      with get_executor(settings.GUIDED_METADATA_EXECUTOR, min(settings.GUIDED_METADATA_WORKERS, len(tasks))) as executor:
+        futures = {executor.submit(_run_metadata_task, task): task[0] for task in tasks}
+        for future, file_name in futures.items():
+          try:
+            timings[file_name] = future.result()
+          except Exception as e:
+            errors[file_name] = e
+
+    if errors:
+      namespace_logger.info(f"{clientUUID}: Creating metadata files failed: {errors}")
+      # do not leave a partial set of metadata files behind
+      for file_name in GUIDED_METADATA_FILES:
+        if os.path.isfile(os.path.join(path, file_name)):
+          os.remove(os.path.join(path, file_name))
+      raise MetadataGenerationError(errors)
+
+    return timings
+
+
+def createGuidedMode(soda_json_structure, clientUUID, manifests_struct, job_record=None, materialized_skeleton=None):
+  
+  job_record = job_record or JobRecord(clientUUID)
 
-   # check if the skeleton directory exists   
-  if not os.path.exists(path):
-    # create the skeleton directory
-    os.makedirs(path)
+  if materialized_skeleton is not None:
+    # the placeholder tree was built while the request was streamed in
+    path, state = adopt_materialized_skeleton(materialized_skeleton, clientUUID), None
+  else:
+    dataset_structure = soda_json_structure["saved-datset-structure-json-obj"]
 
-  # check if the unique path for the client exists
-  path = os.path.join(path, clientUUID)
-  if os.path.exists(path):
-    # remove the directory and all its contents
-    shutil.rmtree(path)
-    
-  # create the directory for the client
-  os.mkdir(path)
+    path, state = prepare_skeleton_directory(clientUUID, estimate_skeleton_bytes(dataset_structure, manifests_struct))
 
-  create_skeleton(dataset_structure, path)
+    with job_record.stage("skeleton"):
+      if state is None:
+        create_skeleton(dataset_structure, path)
+      else:
+        state.sync_tree(dataset_structure, path)
 
   # create metadata files
   namespace_logger.info(f"{clientUUID}: 2. Creating metadata files ( Guided: True ) ")
-  create_metadata_files_guided(soda_json_structure, path, clientUUID)
+  metadata_timings = None
+  with job_record.stage("metadata"):
+    guided_metadata = {key: soda_json_structure[key] for key in ["subjects-table-data", "samples-table-data", "dataset-metadata"]}
+    if state is None or not state.is_current("guided-metadata", guided_metadata):
+      if state is not None:
+        # outputs of the previous request may not be written again ( e.g. an emptied CHANGES or samples table )
+        for metadata_file_name in GUIDED_METADATA_FILES:
+          if os.path.isfile(os.path.join(path, metadata_file_name)):
+            os.remove(os.path.join(path, metadata_file_name))
+      metadata_timings = create_metadata_files_guided(soda_json_structure, path, clientUUID)
+
+  if metadata_timings:
+    # NOTE: the summed file times are not what writing the files one after another costs, threads contending for the GIL
+    # make every file slower, so no gain is derived from them
+    job_record.annotate_stage(
+      "metadata",
+      file_seconds={name: round(seconds, 3) for name, seconds in metadata_timings.items()},
+      summed_file_seconds=round(sum(metadata_timings.values()), 3),
+      wall_seconds=job_record.data["stages"]["metadata"]["duration_seconds"],
+    )
+
+  with job_record.stage("manifests"):
+    if state is not None:
+      manifests_struct = state.pending("manifests", manifests_struct, lambda key: os.path.join(key, manifest_file_name()), path)
+    create_manifests(manifests_struct, path)
 
-  create_manifests(manifests_struct, path)
+  if state is not None:
+    state.save(clientUUID)
 
   return path
 
@@ -723,10 +765,11 @@ Delete the validation directory for the given clientUUID.
 """
 def delete_validation_directory(clientUUID):
     # check if there is a skeleton dataset directory with this clientUUID as the name
-    path = os.path.join(expanduser("~"), "SODA", "skeleton", clientUUID)
+    path = storage.skeleton_path(clientUUID)
     if os.path.exists(path):
         # remove the directory and all its contents
         shutil.rmtree(path)
+    delete_skeleton_state(clientUUID)
 
 
 
@@ -0,0 +1 @@
+from .validationWorkerPool import ValidationWorkerPool, QueueFullError, JobAlreadyQueuedError, JobNotCancellableError, get_worker_pool, running_worker_pool, add_completion_listener
@@ -0,0 +1,110 @@
+"""
+Resource limits of the validation jobs. A worker puts itself under rlimits for address space, CPU time and open files
+before every job, so one pathological dataset fails on its own instead of starving every other job on the host.
+Without the resource module ( e.g. on Windows ) jobs run unlimited.
+"""
+
+import errno
+import os
+import signal
+import sys
+
+from serverConfig import settings
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+# names of the limits as reported in ResourceLimitExceeded results
+MEMORY_LIMIT = "memory"
+CPU_LIMIT = "cpu"
+OPEN_FILES_LIMIT = "open_files"
+
+
+class ResourceLimitError(Exception):
+    """
+    Raised inside a job that ran into one of its resource limits.
+    """
+
+    def __init__(self, limit, message):
+        super().__init__(message)
+        self.limit = limit
+
+
+def _raise_cpu_limit(signum, frame):
+    # past the soft limit the kernel repeats SIGXCPU every CPU second; lift it to the hard limit so the job's cleanup is not
+    # interrupted by a second error ( apply_job_limits sets it again for the next job )
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+    raise ResourceLimitError(CPU_LIMIT, f"The validation used more than {settings.JOB_CPU_LIMIT_SECONDS} seconds of CPU time")
+
+
+def _set_soft_limit(limit, value):
+    _, hard = resource.getrlimit(limit)
+    if hard != resource.RLIM_INFINITY:
+        value = min(value, hard)
+    resource.setrlimit(limit, (value, hard))
+
+
+def apply_job_limits():
+    """
+    Put the calling worker process under the limits of one job. Called before every job: CPU time is counted from now.
+    """
+    if resource is None:
+        return
+
+    if settings.JOB_MEMORY_LIMIT_MB > 0:
+        _set_soft_limit(resource.RLIMIT_AS, settings.JOB_MEMORY_LIMIT_MB * 1024 * 1024)
+
+    if settings.JOB_OPEN_FILES_LIMIT > 0:
+        _set_soft_limit(resource.RLIMIT_NOFILE, settings.JOB_OPEN_FILES_LIMIT)
+
+    if settings.JOB_CPU_LIMIT_SECONDS > 0:
+        # the soft limit sends SIGXCPU, which is turned into a ResourceLimitError; a job stuck where the signal handler can
+        # not run is left to the wall-clock timeouts of the pool
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        signal.signal(signal.SIGXCPU, _raise_cpu_limit)
+        _set_soft_limit(resource.RLIMIT_CPU, int(usage.ru_utime + usage.ru_stime) + settings.JOB_CPU_LIMIT_SECONDS)
+
+
+def exceeded_limit(error):
+    """
+    Return the name of the resource limit error ran into, or None when it is not a resource limit error.
+    """
+    if isinstance(error, ResourceLimitError):
+        return error.limit
+    if isinstance(error, MemoryError):
+        return MEMORY_LIMIT
+    if isinstance(error, OSError) and error.errno in (errno.EMFILE, errno.ENFILE):
+        return OPEN_FILES_LIMIT
+    return None
+
+
+def exceeded_limit_for_exit_code(exitcode):
+    """
+    Return the name of the resource limit a worker that died with exitcode was most likely killed for, or None.
+    """
+    if exitcode == -getattr(signal, "SIGXCPU", 0):
+        return CPU_LIMIT
+    if exitcode == -getattr(signal, "SIGKILL", 0):
+        # the kernel's out of memory killer
+        return MEMORY_LIMIT
+    return None
+
+
+def current_rss_bytes():
+    """
+    Return the resident memory of the calling process, or 0 when it can not be determined.
+    """
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    if resource is not None:
+        # peak instead of current resident memory, in bytes on macOS and kilobytes elsewhere
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss if sys.platform == "darwin" else max_rss * 1024
+    return 0
@@ -0,0 +1,89 @@
+"""
+Code that runs inside a validation worker process. Kept apart from the pool so that importing it in a freshly spawned
+worker does not depend on any state of the server process.
+"""
+
+import os
+
+from jobProgress import JobRecord, add_progress_listener
+from resultStore import save_results
+from serverConfig import settings
+from .resourceLimits import apply_job_limits, exceeded_limit, current_rss_bytes
+
+
+def write_error_result(clientUUID, error, status="Error", **details):
+    """
+    Write an Error result ( or another status of a job that did not finish, e.g. Timeout ) for the given clientUUID so a
+    polling client is not left waiting on a job that can no longer finish. details are added to the result.
+    """
+    job_record = JobRecord.load(clientUUID) or JobRecord(clientUUID)
+    # report the stage the job was in when it failed, finish() clears it from the record
+    stage = job_record.data.get("current_stage")
+    job_record.finish(status)
+
+    results = {"status": status, "error": str(error), "stage": stage, **details, "parsed_report": {}, "full_report": {}, "progress": job_record.to_dict()}
+    save_results(clientUUID, results)
+
+
+def worker_main(worker_id, job_queue, events):
+    """
+    Entry point of a worker process. Pre-warms the validation pipeline then takes jobs from job_queue until it receives None.
+    Events ( event, worker_id, clientUUID or detail ) are sent to the pool on events, the write end of this worker's own pipe.
+    """
+    # lead a process group of our own so a cancelled or timed out job is stopped together with anything it started
+    if hasattr(os, "setsid"):
+        os.setsid()
+
+    # importing validate pulls in sparcur and the rest of the validation stack -- this is the cost we only want to pay once
+    import validate
+
+    # the skeleton stages run here too; validator takes its namespace logger at import time
+    from namespaces import configure_namespaces
+    configure_namespaces()
+    from validator import build_spooled_dataset, delete_validation_directory, preload_templates
+    preload_templates()
+
+    # let the server process know whenever a job's progress record changes
+    add_progress_listener(lambda clientUUID: events.send(("progress", worker_id, clientUUID)))
+
+    events.send(("ready", worker_id, None))
+
+    jobs_done = 0
+    while True:
+        job = job_queue.get()
+        if job is None:
+            return
+
+        clientUUID = job["clientUUID"]
+        events.send(("started", worker_id, clientUUID))
+        limit = None
+        try:
+            apply_job_limits()
+            ds_path = job.get("ds_path")
+            if job.get("spooled"):
+                ds_path = build_spooled_dataset(clientUUID, JobRecord.load(clientUUID) or JobRecord(clientUUID))
+            validate.val_dataset_local_pipeline(ds_path, clientUUID)
+        except Exception as e:
+            delete_validation_directory(clientUUID)
+            limit = exceeded_limit(e)
+            if limit is not None:
+                write_error_result(clientUUID, str(e) or f"The validation exceeded its {limit} limit", status="ResourceLimitExceeded", limit=limit)
+            else:
+                write_error_result(clientUUID, e)
+
+        # hand over to a fresh process instead of carrying leaked memory or a half failed job into the next job
+        jobs_done += 1
+        reason = None
+        if limit is not None:
+            reason = f"the job exceeded its {limit} limit"
+        elif settings.WORKER_MAX_JOBS > 0 and jobs_done >= settings.WORKER_MAX_JOBS:
+            reason = f"it ran {jobs_done} jobs"
+        elif settings.WORKER_MAX_RSS_MB > 0 and current_rss_bytes() > settings.WORKER_MAX_RSS_MB * 1024 * 1024:
+            reason = f"it uses more than {settings.WORKER_MAX_RSS_MB} MB of memory"
+
+        # announced before the job is reported finished so the pool does not hand this worker another job
+        if reason is not None:
+            events.send(("recycling", worker_id, reason))
+        events.send(("finished", worker_id, clientUUID))
+        if reason is not None:
+            return
@@ -0,0 +1,496 @@
+"""
+A pool of long-lived validation worker processes. Each worker imports the validation pipeline ( and with it sparcur, pandas,
+openpyxl and the ontology libraries ) once at startup and then runs val_dataset_local_pipeline for every job it is handed.
+This removes the cold interpreter start and import cost that a fresh `python3 validate.py` subprocess paid on every request.
+"""
+
+import collections
+import multiprocessing
+import multiprocessing.connection
+import os
+import signal
+import threading
+import time
+
+from namespaces import NamespaceEnum, get_namespace_logger
+from jobProgress import JobRecord, notify_progress
+from jobStore import get_job_store
+from serverConfig import settings
+from .validationWorker import worker_main, write_error_result
+from .resourceLimits import exceeded_limit_for_exit_code
+
+
+class QueueFullError(Exception):
+    """
+    Raised when a validation job can not be admitted because the job queue is at its maximum depth.
+    """
+
+
+class JobAlreadyQueuedError(Exception):
+    """
+    Raised when a validation job is submitted for a clientUUID that already has a queued or running job.
+    """
+
+
+class JobNotCancellableError(Exception):
+    """
+    Raised when a validation job can not be cancelled because its request is still being submitted or it is already being stopped.
+    """
+
+
+# spawn gives every worker a clean interpreter instead of a fork of the multithreaded server process
+_context = multiprocessing.get_context("spawn")
+
+
+class _Worker:
+    def __init__(self, worker_id):
+        self.worker_id = worker_id
+        self.process = None
+        self.job_queue = None
+        # read end of the pipe the worker sends its events on; every worker has its own so a killed worker can not leave
+        # a lock held that the others need to report back
+        self.events = None
+        self.ready = False
+        self.current_job = None
+        self.started_at = 0
+        self.job_started_at = 0
+
+
+class ValidationWorkerPool:
+    """
+    Keeps a fixed number of pre-warmed worker processes alive and hands queued validation jobs to idle workers.
+    Workers that crash are restarted and the job they were running is finished with an Error result.
+
+    At most max_concurrent jobs run at once and at most max_queued jobs wait for a worker. A job first reserves a
+    slot in the queue ( before its skeleton is built ) so that a full queue rejects requests before any work is done.
+    """
+
+    def __init__(self, size, max_concurrent, max_queued, completion_listeners=None):
+        self.size = size
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self._lock = threading.Lock()
+        self._pending = collections.deque()
+        self._reserved = set()
+        # clientUUIDs of cancelled, timed out or crashed jobs whose skeleton and result are being cleaned up
+        self._stopping_jobs = set()
+        # event pipes of killed workers, closed by the supervisor once it read them to the end
+        self._discarded_events = []
+        self._workers = [_Worker(worker_id) for worker_id in range(size)]
+        self._supervisor = None
+        self._stopping = False
+        self._completion_listeners = completion_listeners if completion_listeners is not None else []
+        # NOTE: fetched here rather than at import time since worker processes import this module before namespaces are configured
+        self.logger = get_namespace_logger(NamespaceEnum.VALIDATE_DATASET)
+
+    def start(self):
+        self._fail_abandoned_jobs()
+
+        with self._lock:
+            for worker in self._workers:
+                self._start_worker(worker)
+
+        self._supervisor = threading.Thread(target=self._supervise, name="validation-worker-supervisor", daemon=True)
+        self._supervisor.start()
+        self.logger.info(f"Started validation worker pool with {self.size} workers")
+
+    def _fail_abandoned_jobs(self):
+        # jobs still running in the job store were cut short by a restart of the server, their clients would wait forever
+        from validator import discard_spooled_request
+
+        for clientUUID in get_job_store().unfinished_jobs():
+            self.logger.info(f"{clientUUID}: Validation job was interrupted by a server restart")
+            discard_spooled_request(clientUUID)
+            write_error_result(clientUUID, "The validation server restarted while the job was running. Please try again.")
+
+    def reserve(self, clientUUID, check_capacity=True):
+        """
+        Reserve a place in the job queue for clientUUID. With check_capacity=False only the clientUUID is claimed, e.g. while
+        a cached result is written for it, and a full queue does not reject it.
+        Raises QueueFullError when the queue is at its maximum depth and JobAlreadyQueuedError when the client already has a job.
+        """
+        with self._lock:
+            if self._has_job(clientUUID):
+                raise JobAlreadyQueuedError(f"{clientUUID}: A validation job is already queued or running for this client")
+            if check_capacity and len(self._pending) + len(self._reserved) >= self.max_queued:
+                raise QueueFullError(f"{clientUUID}: The validation queue is full")
+            self._reserved.add(clientUUID)
+
+    def is_full(self):
+        with self._lock:
+            return len(self._pending) + len(self._reserved) >= self.max_queued
+
+    def release(self, clientUUID):
+        """
+        Give back a reservation for a job that will not be submitted ( e.g. creating its skeleton failed ).
+        """
+        with self._lock:
+            self._reserved.discard(clientUUID)
+
+    def submit(self, clientUUID, **job_options):
+        """
+        Queue a validation job that holds a reservation. The job runs as soon as a pre-warmed worker is idle.
+        The worker validates the skeleton at job_options["ds_path"] or, with job_options["spooled"], first builds the
+        skeleton from the client's spooled request. job_options are kept with the job and handed to the completion listeners.
+        """
+        with self._lock:
+            self._reserved.discard(clientUUID)
+            self._pending.append({"clientUUID": clientUUID, **job_options})
+            self._dispatch()
+
+    def cancel(self, clientUUID):
+        """
+        Stop the client's job: a queued job is dropped and the worker running a job is killed together with its process
+        group ( and then restarted ). The job finishes with a Cancelled status and its skeleton is removed.
+        Returns the stage the job was in ( "queued" while it waited for a worker ) or None when the pool has no job for
+        clientUUID. Raises JobNotCancellableError while the job's request is still being submitted or the job is already being stopped.
+        """
+        with self._lock:
+            if clientUUID in self._reserved:
+                raise JobNotCancellableError(f"{clientUUID}: The validation job is still being submitted, try again shortly")
+            if clientUUID in self._stopping_jobs:
+                raise JobNotCancellableError(f"{clientUUID}: The validation job is already being stopped")
+
+            process = None
+            job = next((job for job in self._pending if job["clientUUID"] == clientUUID), None)
+            if job is not None:
+                self._pending.remove(job)
+                self._stopping_jobs.add(clientUUID)
+                stage = "queued"
+            else:
+                worker = next((worker for worker in self._workers if worker.current_job is not None and worker.current_job["clientUUID"] == clientUUID), None)
+                if worker is None:
+                    return None
+                job = worker.current_job
+                process = self._detach_worker(worker)
+
+        # killing the worker and removing the skeleton take a while, polls must not wait on the lock for them
+        if process is not None:
+            self._kill_process(process)
+            stage = self._current_stage(clientUUID)
+        self.logger.info(f"{clientUUID}: Validation job cancelled in stage {stage}")
+        self._finish_stopped_job(clientUUID, "The validation was cancelled", "Cancelled", stage=stage)
+
+        with self._lock:
+            self._dispatch()
+        self._notify_completion(job)
+        return stage
+
+    def add_completion_listener(self, listener):
+        """
+        Call listener(job) from the supervisor thread every time a job finishes, whatever its outcome.
+        """
+        self._completion_listeners.append(listener)
+
+    def has_job(self, clientUUID):
+        with self._lock:
+            return self._has_job(clientUUID)
+
+    def queue_position(self, clientUUID):
+        """
+        Return the 1-based position of clientUUID among the jobs waiting for a worker, 0 if its job is running
+        and None if the pool does not know about the job.
+        """
+        with self._lock:
+            # a stopped job counts as running until its result is written
+            if clientUUID in self._stopping_jobs:
+                return 0
+            for worker in self._workers:
+                if worker.current_job is not None and worker.current_job["clientUUID"] == clientUUID:
+                    return 0
+            for position, job in enumerate(self._pending, start=1):
+                if job["clientUUID"] == clientUUID:
+                    return position
+            if clientUUID in self._reserved:
+                return len(self._pending) + 1
+            return None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queued": len(self._pending) + len(self._reserved),
+                "running": sum(1 for worker in self._workers if worker.current_job is not None),
+                "ready_workers": sum(1 for worker in self._workers if worker.ready),
+                "workers": self.size,
+            }
+
+    def _has_job(self, clientUUID):
+        # NOTE: caller must hold self._lock
+        if clientUUID in self._reserved or clientUUID in self._stopping_jobs:
+            return True
+        if any(job["clientUUID"] == clientUUID for job in self._pending):
+            return True
+        return any(worker.current_job is not None and worker.current_job["clientUUID"] == clientUUID for worker in self._workers)
+
+    def shutdown(self):
+        self._stopping = True
+        with self._lock:
+            for worker in self._workers:
+                if worker.process is not None and worker.process.is_alive():
+                    worker.job_queue.put(None)
+        for worker in self._workers:
+            if worker.process is not None:
+                worker.process.join(timeout=5)
+
+    def _start_worker(self, worker):
+        # NOTE: caller must hold self._lock
+        self._discard_events(worker)
+        worker.job_queue = _context.Queue()
+        worker.events, events_writer = _context.Pipe(duplex=False)
+        worker.process = _context.Process(
+            target=worker_main,
+            args=(worker.worker_id, worker.job_queue, events_writer),
+            name=f"validation-worker-{worker.worker_id}",
+            daemon=True,
+        )
+        worker.ready = False
+        worker.current_job = None
+        worker.started_at = time.monotonic()
+        worker.process.start()
+        # the worker holds the only write end now, its pipe reads EOF once it is gone
+        events_writer.close()
+
+    def _dispatch(self):
+        # NOTE: caller must hold self._lock
+        running = sum(1 for worker in self._workers if worker.current_job is not None)
+        for worker in self._workers:
+            if not self._pending or running >= self.max_concurrent:
+                return
+            if worker.ready and worker.current_job is None:
+                job = self._pending.popleft()
+                worker.current_job = job
+                worker.job_started_at = time.monotonic()
+                worker.job_queue.put(job)
+                running += 1
+
+    def _supervise(self):
+        while not self._stopping:
+            finished_jobs = []
+            for worker, connection, message in self._receive_events(timeout=1):
+                if message is not None and message[0] == "progress":
+                    notify_progress(message[2])
+                    continue
+
+                with self._lock:
+                    if worker is None or worker.events is not connection:
+                        # the pipe of a killed worker: whatever it sent before it was stopped is dropped
+                        if message is None:
+                            self._close_discarded_events(connection)
+                        continue
+                    if message is None:
+                        # the worker exited, it is replaced once its process is gone
+                        connection.close()
+                        worker.events = None
+                        continue
+                    event, _, clientUUID = message
+                    self._handle_event(event, worker, clientUUID, finished_jobs)
+
+            self._stop_timed_out_jobs(finished_jobs)
+            self._restart_crashed_workers(finished_jobs)
+            with self._lock:
+                self._dispatch()
+
+            # listeners run outside of the lock so they can not stall job dispatch
+            for job in finished_jobs:
+                self._notify_completion(job)
+
+    def _receive_events(self, timeout):
+        """
+        Wait up to timeout seconds for events of the workers. Returns ( worker, connection, message ) for every message
+        received, message is None once a worker's pipe is closed and worker is None for the pipes of killed workers.
+        """
+        with self._lock:
+            connections = {worker.events: worker for worker in self._workers if worker.events is not None}
+            connections.update((connection, None) for connection in self._discarded_events)
+        if not connections:
+            time.sleep(timeout)
+            return []
+
+        received = []
+        for connection in multiprocessing.connection.wait(list(connections), timeout=timeout):
+            while True:
+                try:
+                    message = connection.recv()
+                except (EOFError, OSError):
+                    received.append((connections[connection], connection, None))
+                    break
+                received.append((connections[connection], connection, message))
+                if not connection.poll():
+                    break
+        return received
+
+    def _discard_events(self, worker):
+        # NOTE: caller must hold self._lock; the supervisor may be waiting on the pipe, it closes it once it reads EOF
+        if worker.events is not None:
+            self._discarded_events.append(worker.events)
+            worker.events = None
+
+    def _close_discarded_events(self, connection):
+        # NOTE: caller must hold self._lock
+        if connection in self._discarded_events:
+            self._discarded_events.remove(connection)
+        connection.close()
+
+    def _notify_completion(self, job):
+        for listener in self._completion_listeners:
+            try:
+                listener(job)
+            except Exception as e:
+                self.logger.info(f"{job['clientUUID']}: Job completion listener failed: {e}")
+
+    def _handle_event(self, event, worker, clientUUID, finished_jobs):
+        # NOTE: caller must hold self._lock
+        if event == "ready":
+            worker.ready = True
+            self.logger.info(f"Validation worker {worker.worker_id} is ready")
+        elif event == "finished":
+            if worker.current_job is not None and worker.current_job["clientUUID"] == clientUUID:
+                finished_jobs.append(worker.current_job)
+                worker.current_job = None
+            self.logger.info(f"{clientUUID}: Validation job finished on worker {worker.worker_id}")
+        elif event == "recycling":
+            # the worker exits, it is replaced once it is gone; clientUUID holds the reason here
+            worker.ready = False
+            self.logger.info(f"Validation worker {worker.worker_id} is recycled because {clientUUID}")
+
+    def _current_stage(self, clientUUID):
+        job_record = JobRecord.load(clientUUID)
+        return job_record.data.get("current_stage") if job_record is not None else None
+
+    def _timed_out_stage(self, clientUUID, job_started_at):
+        limits = [limit for limit in [settings.JOB_TIMEOUT_SECONDS, settings.STAGE_TIMEOUT_SECONDS, *settings.STAGE_TIMEOUTS.values()] if limit > 0]
+        running_seconds = time.monotonic() - job_started_at
+        # the job record is only read once the job ran long enough to hit any of the limits
+        if not limits or running_seconds < min(limits):
+            return None
+
+        job_record = JobRecord.load(clientUUID)
+        stage = job_record.data.get("current_stage") if job_record is not None else None
+        if settings.JOB_TIMEOUT_SECONDS > 0 and running_seconds > settings.JOB_TIMEOUT_SECONDS:
+            return stage or "unknown"
+        # current_stage is kept after the stage finished, the time until the next stage starts is not charged to it
+        if stage is None or stage not in job_record.data["stages"] or job_record.data["stages"][stage]["finished_at"] is not None:
+            return None
+
+        stage_limit = settings.STAGE_TIMEOUTS.get(stage, settings.STAGE_TIMEOUT_SECONDS)
+        if stage_limit > 0 and time.time() - job_record.data["stages"][stage]["started_at"] > stage_limit:
+            return stage
+        return None
+
+    def _stop_timed_out_jobs(self, finished_jobs):
+        with self._lock:
+            running = [(worker, worker.current_job, worker.job_started_at) for worker in self._workers if worker.current_job is not None]
+
+        for worker, job, job_started_at in running:
+            # the job records are read without the lock so polls are answered meanwhile
+            stage = self._timed_out_stage(job["clientUUID"], job_started_at)
+            if stage is None:
+                continue
+
+            with self._lock:
+                # the job may have finished or been cancelled while its record was read
+                if worker.current_job is not job:
+                    continue
+                process = self._detach_worker(worker)
+
+            clientUUID = job["clientUUID"]
+            self.logger.info(f"{clientUUID}: Validation job timed out in stage {stage} on worker {worker.worker_id}")
+            self._kill_process(process)
+            self._finish_stopped_job(clientUUID, f"The validation did not finish in time, it was stopped in the {stage} stage", "Timeout", stage=stage)
+            finished_jobs.append(job)
+
+    def _detach_worker(self, worker):
+        """
+        Take the running job away from worker and stop listening to it, so the worker can be killed without holding the
+        lock. Returns the worker's process. The job's clientUUID stays busy until _finish_stopped_job is done with it.
+        """
+        # NOTE: caller must hold self._lock
+        self._stopping_jobs.add(worker.current_job["clientUUID"])
+        worker.current_job = None
+        worker.ready = False
+        self._discard_events(worker)
+        return worker.process
+
+    def _kill_process(self, process):
+        # the worker leads its own process group ( see worker_main ), anything the job started goes with it
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (AttributeError, ProcessLookupError, PermissionError):
+            process.kill()
+        process.join(timeout=5)
+
+    def _finish_stopped_job(self, clientUUID, error, status, **details):
+        # NOTE: called without self._lock
+        from validator import delete_validation_directory, discard_spooled_request
+
+        try:
+            delete_validation_directory(clientUUID)
+            discard_spooled_request(clientUUID)
+            write_error_result(clientUUID, error, status=status, **details)
+        finally:
+            with self._lock:
+                self._stopping_jobs.discard(clientUUID)
+
+    def _restart_crashed_workers(self, finished_jobs):
+        crashed_jobs = []
+        with self._lock:
+            for worker in self._workers:
+                # events still in the pipe are read first, a worker that recycled itself reported its last job finished
+                if worker.process.is_alive() or (worker.events is not None and worker.events.poll()):
+                    continue
+                if worker.events is not None:
+                    # nothing left to read but the pipe is not closed: something the worker started still holds it
+                    worker.events.close()
+                    worker.events = None
+
+                if worker.current_job is not None:
+                    crashed_jobs.append((worker.current_job, worker.worker_id, worker.process.exitcode))
+                    self._stopping_jobs.add(worker.current_job["clientUUID"])
+                    worker.current_job = None
+
+                # avoid a tight restart loop when a worker dies during startup
+                if time.monotonic() - worker.started_at < settings.WORKER_RESTART_DELAY_SECONDS:
+                    continue
+
+                self.logger.info(f"Restarting validation worker {worker.worker_id}")
+                self._start_worker(worker)
+
+        for job, worker_id, exitcode in crashed_jobs:
+            clientUUID = job["clientUUID"]
+            self.logger.info(f"{clientUUID}: Validation worker {worker_id} crashed with exit code {exitcode}")
+            limit = exceeded_limit_for_exit_code(exitcode)
+            if limit is not None:
+                self._finish_stopped_job(clientUUID, f"The validation worker was killed, most likely for exceeding the {limit} limit", "ResourceLimitExceeded", limit=limit)
+            else:
+                self._finish_stopped_job(clientUUID, "The validation worker stopped unexpectedly. Please try again.", "Error")
+            finished_jobs.append(job)
+
+_pool = None
+_pool_lock = threading.Lock()
+_completion_listeners = []
+
+
+def add_completion_listener(listener):
+    """
+    Register listener(job) to be called every time a job of the process wide pool finishes. Registering does not start the pool.
+    """
+    _completion_listeners.append(listener)
+
+
+def get_worker_pool():
+    """
+    Return the process wide worker pool, starting it on first use.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ValidationWorkerPool(settings.WORKER_POOL_SIZE, settings.MAX_CONCURRENT_JOBS, settings.MAX_QUEUED_JOBS, _completion_listeners)
+            _pool.start()
+        return _pool
+
+
+def running_worker_pool():
+    """
+    Return the process wide worker pool if it was started, None otherwise. Unlike get_worker_pool this never starts it.
+    """
+    return _pool